@@ -1,21 +1,56 @@
 """Basic functionality classes."""
 
+import itertools
 import uuid
 
+# random base of the UUIDs exported for integer ids
+_UUID_BASE = uuid.uuid4().int
+
 
 class Id:
     """
     Object id functionality. Used by energotons,
     pools, relations, work units and tasks.
 
+    Generated ids are UUIDs by default. After calling
+    Id.use_int_ids(), they are process-local increasing
+    integers instead, which are cheaper to generate, hash
+    and compare. UUIDs for them are made only on export,
+    see the uuid property.
+
     Args:
-        id_ (Optional[Union[str, uuid.UUID]]):
+        id_ (Optional[Union[str, int, uuid.UUID]]):
             Explicit object id. If not provided,
-            a UUID is generated.
+            an id is generated.
     """
 
+    __slots__ = ("id",)
+
+    _int_ids = False
+    _counter = itertools.count(1)
+
     def __init__(self, id_=None):
-        self.id = id_ or uuid.uuid4()
+        if id_:
+            self.id = id_
+        elif Id._int_ids:
+            self.id = next(Id._counter)
+        else:
+            self.id = uuid.uuid4()
+
+    @staticmethod
+    def use_int_ids(enabled=True):
+        """Switch generation of ids between integers and UUIDs.
+
+        The integers are unique within the process. They
+        shouldn't be mixed with explicit integer ids. Units
+        created before the switch keep their ids, and the
+        mixed ids are ordered by type first.
+
+        Args:
+            enabled (bool):
+                True to generate integer ids, False for UUIDs.
+        """
+        Id._int_ids = enabled
 
     def __eq__(self, other):
         """Magic method for the equality operator.
@@ -35,3 +70,23 @@ class Id:
             int: Object hash.
         """
         return hash(self.id)
+
+    @property
+    def uuid(self):
+        """UUID of the object, used to export it.
+
+        UUID ids are returned as they are. Integer ids are
+        mixed into a random base, chosen once per process.
+        Other ids are hashed into a name-based UUID.
+
+        Returns:
+            uuid.UUID: UUID of the object.
+        """
+        if isinstance(self.id, uuid.UUID):
+            return self.id
+
+        if isinstance(self.id, int):
+            # only the random bits of the base are changed
+            return uuid.UUID(int=_UUID_BASE ^ self.id & 0xFFFFFFFFFFFF)
+
+        return uuid.uuid5(uuid.NAMESPACE_OID, str(self.id))
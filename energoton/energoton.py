@@ -1,22 +1,64 @@
+import array
+import bisect
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import multiprocessing
+import pickle
+import threading
+import time
+
 from base import Id
-from work import WorkDone, Blocking
-from .planner import Plan
+from work import WorkDone
+from .planner import BestPlans, Plan
 
 
 class Energoton(Id):
-    def __init__(self, capacity, id_=None, name=None):
+    # maximum size of the tables used
+    # to build plans without a search
+    knapsack_size = 2**22
+
+    def __init__(self, capacity, id_=None, name=None, memo_size=2**16):
         self.name = name
         self._capacity = capacity
         self.energy_left = self.next_charge
+        self.memo_size = memo_size
 
         self.pool = None
         self._dry_pool = None
+        self._memo = collections.OrderedDict()
+        self._shared = None
+        self._slot = None
+        self._excluded = 0
+        self._kept = None
+        self._mirror = None
+        self._mirror_first = -1
+        self._max_plans = None
+        self._tolerance = 0
+        self._budget = None
+        self.optimal = True
 
         super().__init__(id_)
 
     def __eq__(self, other):
         return self.id == other.id
 
+    def __copy__(self):
+        """
+        Copy the energoton. The copy gets its own memo,
+        so that it can build plans concurrently with
+        the original energoton.
+
+        Returns:
+            Energoton: The copy.
+        """
+        energoton = self.__class__.__new__(self.__class__)
+        energoton.__dict__.update(self.__dict__)
+        energoton.id = self.id
+        energoton._memo = collections.OrderedDict()
+        return energoton
+
     @property
     def capacity(self):
         return self._capacity
@@ -35,68 +77,1080 @@ class Energoton(Id):
     def recharge(self):
         self.energy_left = self.next_charge
 
-    def _commit_plan(self, plan, plans):
-        if plans:
-            if plan.calc_value() < plans[0].value:
-                return
+    def _commit_plan(self, plans, value):
+        if value < self._incumbent() or not self._is_new():
+            return
+
+        if not self._classes:
+            if self._mirror is None or not self._is_mirrored(
+                self._path, value
+            ):
+                plans.add(self._make_plan(self._path))
+        else:
+            for i, (order, path) in enumerate(self._expand(self._path)):
+                if i and self._budget is not None and self._out_of_budget():
+                    # every choice counts as a search node
+                    break
+
+                if not i:
+                    # the plans reached by the search later go
+                    # after the first choice of the plan
+                    plans.horizon = order
+
+                if self._mirror is not None and self._is_mirrored(path, value):
+                    continue
+
+                if not plans.add(self._make_plan(path), order):
+                    # the choices go in the order, so
+                    # the rest of them aren't kept either
+                    break
+
+        self._raise_incumbent(value)
+
+    def _collect(self, leaves):
+        """Commit the plans the search reaches.
+
+        Args:
+            leaves (Iterator[int]):
+                Values of the plans, yielded by the
+                search, while it stands on them.
+
+        Returns:
+            List[Plan]: The best plans.
+        """
+        plans = self._kept = BestPlans(self._max_plans, self._tolerance)
+        for value in leaves:
+            self._commit_plan(plans, value)
+
+        return list(plans)
+
+    def _expand(self, path):
+        """Put every choice of identical tasks in the plan.
+
+        The search works only on the first untaken tasks of
+        every class of identical tasks, so the plan stands
+        for all the plans with the same number of tasks
+        taken out of every class. Taking a later task of
+        a class puts the plan later in the order of the
+        search, so the choices are made lazily, from
+        the earliest one.
 
-            sorted_plan = Plan(sorted(plan, key=lambda w: w.task.id))
-            sorted_plan.commit()
+        Args:
+            path (List[Tuple[int, int]]):
+                Indices of the tasks and amounts of energy spent.
 
-            if sorted_plan.value > plans[0].value:
-                plans.clear()
-            elif sorted_plan in plans:
-                return
+        Yields:
+            Tuple[Tuple[int], List[Tuple[int, int]]]:
+                Position of every plan in the order of the
+                search, and its work, the given plan first.
+        """
+        rest = []
+        taken = {}
+        for ind, amount in path:
+            members = self._class_of[ind]
+            if members is None:
+                rest.append((ind, amount))
+            else:
+                taken.setdefault(id(members), (members, []))[1].append(amount)
+
+        taken = list(taken.values())
+
+        def chosen_path(choices):
+            chosen = list(rest)
+            for (members, amounts), (full, partial) in zip(taken, choices):
+                chosen.extend((members[i], amounts[0]) for i in full)
+                if partial is not None:
+                    chosen.append((members[partial], amounts[-1]))
+
+            return chosen
+
+        # every class is chosen from as the first tasks
+        # done in full, and the task done partially
+        choices = []
+        for members, amounts in taken:
+            if amounts[-1] < self._start_todo[members[0]]:
+                choices.append(
+                    (tuple(range(len(amounts) - 1)), len(amounts) - 1)
+                )
+            else:
+                choices.append((tuple(range(len(amounts))), None))
+
+        choices = tuple(choices)
+        first = chosen_path(choices)
+        heap = [(self._order(first), choices, first)]
+        seen = {choices}
+        while heap:
+            order, choices, path = heapq.heappop(heap)
+            yield order, path
+
+            for i, (members, _) in enumerate(taken):
+                choice = _next_choice(choices[i], len(members))
+                if choice is None:
+                    continue
+
+                next_choices = choices[:i] + (choice,) + choices[i + 1 :]
+                if next_choices not in seen:
+                    seen.add(next_choices)
+                    next_path = chosen_path(next_choices)
+                    heapq.heappush(
+                        heap, (self._order(next_path), next_choices, next_path)
+                    )
+
+    def _order(self, path):
+        """Position of the plan in the order of the search.
+
+        Without the classes of identical tasks, the search
+        reaches plans in the order of the first sequences of
+        the tasks leading to them. The position is calculated
+        from the sequence, so that the plans chosen out of the
+        classes go in the same order.
+
+        Args:
+            path (Iterable[Tuple[int, int]]):
+                Indices of the tasks and amounts of energy spent.
+
+        Returns:
+            Tuple[int]: The position, lower for the plans reached earlier.
+        """
+        full = []
+        partial = []
+        for ind, amount in path:
+            if amount < self._start_todo[ind]:
+                partial.append(ind)
+            else:
+                full.append(ind)
+
+        if self._canonical:
+            sequence = sorted(full, key=self._rank.__getitem__)
         else:
-            sorted_plan = Plan(sorted(plan, key=lambda w: w.task.id))
-            sorted_plan.commit()
+            # the least tasks, which can be taken, go first
+            full.sort(key=self._position.__getitem__)
+            solved = self._solved
+            self._solved = self._start_solved
+
+            sequence = []
+            while full:
+                ind = next(
+                    (ind for ind in full if self._is_actual(ind)), full[0]
+                )
+                full.remove(ind)
+                sequence.append(ind)
+                self._solved |= 1 << ind
+
+            self._solved = solved
+
+        # plans go in the order of the positions
+        # of their tasks in the sequence
+        position = self._position
+        return tuple(position[ind] for ind in sequence + partial)
+
+    def _is_new(self):
+        """Register the state of the plan being committed.
+
+        Returns:
+            bool: True if no plan was committed from the state yet.
+        """
+        if self._canonical:
+            return True
+
+        state = self._state()
+        if state in self._committed:
+            return False
+
+        self._committed.add(state)
+        return True
+
+    def _raise_incumbent(self, value):
+        """Register the value of a plan found.
+
+        Args:
+            value (int): Value of the plan.
+        """
+        if value > self._best:
+            self._best = value
+
+        shared = self._shared
+        if shared is not None and value > shared[self._slot]:
+            with shared.get_lock():
+                if value > shared[self._slot]:
+                    shared[self._slot] = value
+
+    def _make_plan(self, path):
+        """Build the plan continuing the initial one with the given work.
+
+        Args:
+            path (Iterable[Tuple[int, int]]):
+                Indices of the tasks and amounts of energy spent.
+
+        Returns:
+            Plan: The committed plan.
+        """
+        dry = self._dry_pool
+        return self._plan.extended(
+            [
+                WorkDone(dry.tasks[ind], amount, self, self._cycle)
+                for ind, amount in path
+            ]
+        )
+
+    def _paths(self, plans):
+        """Short form of the built plans.
+
+        Args:
+            plans (List[Plan]): Plans built by the energoton.
+
+        Returns:
+            List[Tuple[int, Tuple[Tuple[int, int]]]]:
+                Values of the plans and the work added to the
+                initial plan, as indices of the tasks and amounts.
+        """
+        dry = self._dry_pool
+        spent = self._plan.spent
+
+        # every task is worked on once in a plan, so the
+        # work added is the difference of the spendings
+        return [
+            (
+                plan.value,
+                tuple(
+                    sorted(
+                        (dry.index[id_], amount - spent.get(id_, 0))
+                        for id_, amount in plan.spent.items()
+                        if amount != spent.get(id_, 0)
+                    )
+                ),
+            )
+            for plan in plans
+        ]
+
+    def _is_mirrored(self, path, value):
+        """Check if the plan is built from another plan as well.
+
+        The energoton, which took the previous step, is
+        interchangeable with this one. If the work of the two
+        energotons is equally valuable and independent, it can
+        be swapped, so out of the two plans only the one, in
+        which the previous energoton took the work going first
+        in the order of the tasks, is kept.
+
+        Args:
+            path (Iterable[Tuple[int, int]]):
+                Indices of the tasks and amounts of energy spent.
+            value (int): Value of the plan.
+
+        Returns:
+            bool: True if the plan is built from another plan.
+        """
+        done, done_value, done_mask = self._mirror
+        if value - self._plan.value != done_value:
+            return False
+
+        path = tuple(sorted(path))
+        if path >= done:
+            return False
+
+        for ind, _ in path:
+            # the work must be possible before the previous step
+            if done_mask >> ind & 1 or self._blockers[ind] & done_mask:
+                return False
+
+        # and the work of the previous step must be possible after it
+        return all(self._is_actual(ind) for ind, _ in done)
+
+    def _mirrors_only(self, ind):
+        """
+        Check if the plans reached after taking a task going
+        before the work of the previous energoton are all
+        mirrored (see _is_mirrored()) or not to be kept.
+
+        Such plans are independent of the previous work, so
+        the previous energoton could do them instead, and they
+        can't be more valuable than the work it did, as it was
+        the best. So, if a plan as valuable as the previous
+        work has already been found, the equally valuable
+        plans of the branch are mirrored, and the rest are
+        worse than the plan found.
+
+        Args:
+            ind (int): Index of the task taken.
+
+        Returns:
+            bool: True if the branch can be skipped.
+        """
+        if self._classes:
+            members = self._class_of[ind]
+            if members is not None and members[-1] >= self._mirror_first:
+                # the task can be swapped for an identical one,
+                # going after the previous work, in the plans
+                return False
+
+        _, done_value, _ = self._mirror
+        return self._incumbent() >= self._plan.value + done_value
+
+    def _incumbent(self):
+        """
+        The lowest value of a plan to be kept, considering the
+        best plan found so far. In the parallel mode plans
+        found by the other workers count as well.
+
+        Returns:
+            int: The lowest value, -1 if no plans were found yet.
+        """
+        best = self._best
+        if self._shared is not None:
+            best = max(best, self._shared[self._slot])
+
+        if best < 0:
+            return -1
+
+        floor = best - self._tolerance
+        if self._kept is not None:
+            floor = max(floor, self._kept.floor)
+
+        return floor
 
-        plans.append(sorted_plan)
+    def _upper_bound(self, energy, last=-1):
+        """
+        The best value the given amount of energy can
+        still add to a plan: fractional knapsack over
+        the unsolved tasks, ignoring relations.
 
-    def _build_plans(self, task, plan, tasks, plans, cycle):
-        if task:
-            work_done = self.work(task, cycle)
-            plan.append(work_done)
-            if task["cost"] == task["spent"]:
-                ind = tasks.index(task)
-                del tasks[ind]
+        Args:
+            energy (int): Energy left.
+            last (int):
+                Rank of the last task taken in the canonical
+                mode. Only the tasks after it can be taken.
+
+        Returns:
+            int: Upper bound of the value to add.
+        """
+        dry = self._dry_pool
+        bound = 0
+        for ind in self._by_density:
+            todo = dry.cost[ind] - dry.spent[ind]
+            if todo == 0 or self._rank[ind] <= last:
+                continue
+
+            if todo > energy:
+                return bound + dry.value[ind] * energy // todo
+
+            energy -= todo
+            bound += dry.value[ind]
+
+        return bound
+
+    def _state(self):
+        """Hashable key of the current search state.
+
+        The state is the set of the tasks solved since the
+        search start, plus the task done partially, if any.
+        Partial work ends the plan, so there's at most one
+        such task, and it's the last one taken. Plans built
+        from the same state are the same, no matter in which
+        order the tasks were taken to reach it.
+
+        Returns:
+            Hashable: The state key.
+        """
+        solved = self._solved ^ self._start_solved
+        path = self._path
+        if path and not solved >> path[-1][0] & 1:
+            return solved, path[-1]
+
+        return solved
+
+    def _visit(self):
+        """
+        Register the current search state in the memo.
+
+        The memo keeps `memo_size` most recently seen states.
+
+        Returns:
+            bool: True if the state has already been expanded.
+        """
+        state = self._state()
+        if state in self._memo:
+            self._memo.move_to_end(state)
+            return True
+
+        self._memo[state] = None
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+
+        return False
+
+    def _canonical_order(self, order):
+        """
+        Order the tasks for the canonical mode.
+
+        The given order is kept, except that blockers are
+        moved before the tasks they block, so that any
+        set of tasks can be taken in the increasing order.
+
+        Args:
+            order (List[int]): Indices of the tasks.
+
+        Returns:
+            List[int]: Indices of the tasks in the canonical order.
+        """
+        position = {ind: pos for pos, ind in enumerate(order)}
+        blockers = dict.fromkeys(order, 0)
+        blocked = collections.defaultdict(list)
+
+        for ind in order:
+            mask = self._blockers[ind]
+            while mask:
+                blocker = (mask & -mask).bit_length() - 1
+                mask &= mask - 1
+
+                if blocker in position:
+                    blockers[ind] += 1
+                    blocked[blocker].append(ind)
+
+        free = [position[ind] for ind, count in blockers.items() if not count]
+        heapq.heapify(free)
+
+        canonical = []
+        while free:
+            ind = order[heapq.heappop(free)]
+            canonical.append(ind)
+
+            for blocked_ind in blocked[ind]:
+                blockers[blocked_ind] -= 1
+                if not blockers[blocked_ind]:
+                    heapq.heappush(free, position[blocked_ind])
+
+        # tasks blocking each other in
+        # a loop can never become actual
+        canonical.extend(ind for ind in order if blockers[ind])
+        return canonical
+
+    def _step(self, ind, value, last):
+        """Work on the task and continue building the plan.
+
+        Args:
+            ind (int): Index of the task.
+            value (int): Value of the plan before the step.
+            last (int): Rank of the last task taken in order.
+
+        Yields:
+            int: Values of the plans reached.
+        """
+        solved = self._solved
+        self._work_on(ind)
+        yield from self._build_plans(value + self._dry_pool.value[ind], last)
+        self._undo(solved)
+
+    def _work_on(self, ind):
+        """Spend energy on the task.
+
+        Args:
+            ind (int): Index of the task.
+        """
+        dry = self._dry_pool
+        amount = min(self.energy_left, dry.cost[ind] - dry.spent[ind])
+
+        self.energy_left -= amount
+        dry.spent[ind] += amount
+        self._path.append((ind, amount))
+
+        if dry.spent[ind] == dry.cost[ind]:
+            self._solved |= 1 << ind
+
+    def _undo(self, solved):
+        """Take back the last work done.
+
+        Args:
+            solved (int): Bitmask of the solved tasks before the work.
+        """
+        ind, amount = self._path.pop()
+        self._dry_pool.spent[ind] -= amount
+        self.energy_left += amount
+        self._solved = solved
+
+    def _unwind(self):
+        """Take back all the work of the stopped search."""
+        while self._path:
+            self._undo(self._solved)
+
+    def _affordable(self):
+        """Unsolved tasks, which the energy left is enough to work on.
+
+        Returns:
+            List[int]: Indices of the tasks, sorted by the amount to do.
+        """
+        if self.solves_partially:
+            return self._by_todo
+
+        return self._by_todo[
+            : bisect.bisect_right(self._todos, self.energy_left)
+        ]
+
+    def _out_of_budget(self):
+        """Count a search node and check the search budget.
+
+        Returns:
+            bool: True if the search must stop.
+        """
+        if not self.optimal:
+            return True
+
+        self._nodes += 1
+        max_nodes, deadline = self._budget
+        if max_nodes is not None and self._nodes > max_nodes:
+            self.optimal = False
+        elif (
+            deadline is not None
+            and not self._nodes % 256
+            and time.monotonic() >= deadline
+        ):
+            self.optimal = False
+
+        return not self.optimal
+
+    def _build_plans(self, value, last):
+        """Search for plans continuing the current one.
+
+        Plans are yielded while the search stands on them, so
+        that they can be committed from the search state.
+
+        Args:
+            value (int): Value of the current plan.
+            last (int): Rank of the last task taken in order.
+
+        Yields:
+            int: Values of the plans reached.
+        """
+        if self._budget is not None and self._out_of_budget():
+            if self._best < 0:
+                # the plan being built is the only one found
+                yield value
+            return
+
+        if not self._canonical and self._visit():
+            # the state has already been reached by
+            # taking the same tasks in another order
+            return
 
         if self.energy_left == 0:
-            self._commit_plan(plan, plans)
+            yield value
+            return
+
+        floor = self._incumbent()
+        if floor > 0 and (
+            value + self._upper_bound(self.energy_left, last) < floor
+        ):
+            # the branch can't reach the plans to keep
+            return
+
+        dry = self._dry_pool
+        can_continue = False
+        for ind in self._affordable():
+            if self._solved >> ind & 1 or not self._is_actual(ind):
+                continue
+
+            can_continue = True
+
+            twin = self._twin[ind]
+            if twin >= 0 and not self._solved >> twin & 1:
+                # an identical task is to be taken first
+                continue
+
+            if (
+                self._excluded >> ind & 1
+                and dry.cost[ind] - dry.spent[ind] <= self.energy_left
+            ):
+                # plans solving the task are built by another branch
+                continue
+
+            rank = self._rank[ind]
+            if rank > last:
+                next_last = rank if self._canonical else last
+            elif dry.cost[ind] - dry.spent[ind] > self.energy_left:
+                # partial work ends the plan, so the
+                # task doesn't have to follow the order
+                next_last = last
+            else:
+                continue
+
+            if ind < self._mirror_first and self._mirrors_only(ind):
+                continue
+
+            # the step is made in place, as a generator
+            # per step slows down the search noticeably
+            solved = self._solved
+            self._work_on(ind)
+            yield from self._build_plans(value + dry.value[ind], next_last)
+            self._undo(solved)
+
+        if not can_continue:
+            yield value
+
+    def _build_plans_parallel(self, workers):
+        """
+        Build the plans, splitting the search between processes
+        by the first task taken. The workers share the value of
+        the best plan found, so that every one of them prunes
+        branches against the best plan found by any of them.
+
+        The branches don't overlap: a branch doesn't solve the
+        first tasks of the branches going before it, as the
+        plans solving them are built by those branches. In the
+        canonical mode, tasks are taken in order, so the branches
+        don't overlap anyway.
+
+        Args:
+            workers (int): Maximum number of processes.
+
+        Returns:
+            List[Plan]: The best plans found.
+        """
+        branches = [
+            ind
+            for ind in self._affordable()
+            if not self._solved >> ind & 1
+            and self._is_actual(ind)
+            and self._twin[ind] < 0
+        ]
+        if self.energy_left == 0 or len(branches) < 2:
+            return self._collect(self._build_plans(self._plan.value, -1))
+
+        excluded = []
+        mask = 0
+        for ind in branches:
+            excluded.append(0 if self._canonical else mask)
+            mask |= 1 << ind
+
+        executor, shared = _worker_pool(workers)
+        slot = _take_slot(shared)
+        try:
+            job = (next(_jobs), pickle.dumps(self), slot)
+            results = list(
+                executor.map(
+                    _build_branch,
+                    itertools.repeat(job),
+                    branches,
+                    excluded,
+                )
+            )
+        finally:
+            _free_slot(slot)
+
+        self.optimal = all(optimal for _, optimal in results)
+
+        # merge in the order of the branches, so that
+        # the plans go in the same order as in serial
+        plans = BestPlans(self._max_plans, self._tolerance)
+        for branch, _ in results:
+            for value, path in branch:
+                if value < plans.floor:
+                    continue
+
+                plans.add(
+                    self._make_plan(path),
+                    self._order(path) if self._classes else None,
+                )
+
+        return list(plans)
+
+    def build_plans(
+        self,
+        dry_pool,
+        cycle=1,
+        plan=None,
+        canonical=False,
+        workers=None,
+        time_limit=None,
+        max_nodes=None,
+        max_plans=None,
+        tolerance=0,
+        symmetric_to=None,
+    ):
+        """Build the best plans for the given dry pool.
+
+        If the time or the nodes limit is hit, the best plans
+        found so far are returned, and the `optimal` attribute
+        of the energoton is set to False. Otherwise, it's True.
+
+        Args:
+            dry_pool (work.dry_pool.DryPool): Tasks to be solved.
+            cycle (int): Number of the work cycle.
+            plan (Optional[Plan]): Plan to continue.
+            canonical (bool):
+                Take tasks only in the canonical order, so that
+                every set of tasks is considered once instead
+                of once per its every permutation.
+            workers (Optional[int]):
+                Number of processes to build plans in parallel.
+                The plans are the same as the ones built serially.
+                The processes are started once, and re-used by
+                the following calls.
+            time_limit (Optional[float]):
+                Seconds to build plans in.
+            max_nodes (Optional[int]):
+                Number of search steps to build plans in. In
+                the parallel mode, it's the number per process.
+            max_plans (Optional[int]):
+                Maximum number of plans to keep. Out of equally
+                good plans the ones found first are kept.
+            tolerance (int):
+                Keep also plans, which are worse than the best
+                one by at most this value. The plans go from
+                the best to the worst then.
+            symmetric_to (Optional[Tuple[Tuple[Tuple[int, int]], int]]):
+                Work done on the previous step by an energoton
+                interchangeable with this one, as indices of the
+                tasks and amounts of energy spent, and the value
+                of the work, which must be the best work of that
+                energoton. The plans, which are also built by
+                swapping the work of the two energotons, are
+                skipped, so that every assignment of the work is
+                built once. Not to be used with a tolerance.
+
+        Returns:
+            List[Plan]: The best plans found.
+        """
+        self._prepare(
+            dry_pool,
+            cycle,
+            plan,
+            canonical,
+            time_limit,
+            max_nodes,
+            max_plans,
+            tolerance,
+            symmetric_to,
+        )
+
+        paths = self._direct_paths()
+        if paths is not None:
+            return [
+                self._make_plan(path)
+                for path in itertools.islice(paths, max_plans)
+            ]
+
+        self._group_identical()
+        if workers and workers > 1:
+            plans = self._build_plans_parallel(workers)
         else:
-            can_continue = False
-            for t in tasks:
-                if not self.can_solve(t):
-                    break
+            plans = self._collect(self._build_plans(self._plan.value, -1))
+
+        # the states and the plans kept are only needed during
+        # the search (the plans refer back to the energoton,
+        # which breaks pickling it for the parallel search)
+        self._committed = set()
+        self._memo.clear()
+        self._kept = None
+        return plans
 
-                if self._is_actual(t["id"]):
-                    self._build_plans(t, plan, tasks, plans, cycle)
-                    can_continue = True
+    def best_value(self, dry_pool, cycle=1, plan=None, canonical=False):
+        """Find the value of the best plans for the given dry pool.
 
-            if not can_continue:
-                self._commit_plan(plan, plans)
+        Args:
+            dry_pool (work.dry_pool.DryPool): Tasks to be solved.
+            cycle (int): Number of the work cycle.
+            plan (Optional[Plan]): Plan to continue.
+            canonical (bool):
+                Take tasks only in the canonical order.
 
-        if task:
-            if task["cost"] == task["spent"]:
-                tasks.insert(ind, task)
+        Returns:
+            int: Value of the best plans.
+        """
+        self._prepare(dry_pool, cycle, plan, canonical)
+
+        paths = self._direct_paths()
+        if paths is not None:
+            return self._make_plan(next(iter(paths))).value
+
+        return self._search_best()
+
+    def iter_plans(
+        self, dry_pool, cycle=1, plan=None, canonical=False, best=None
+    ):
+        """Build the best plans for the given dry pool one by one.
+
+        The best value is found first (unless it's given), and
+        then the search is repeated, yielding the plans of the
+        best value as soon as it reaches them, so that the plans
+        aren't held all together. The energoton must not be used
+        to build other plans, until the iteration is over.
+
+        Args:
+            dry_pool (work.dry_pool.DryPool): Tasks to be solved.
+            cycle (int): Number of the work cycle.
+            plan (Optional[Plan]): Plan to continue.
+            canonical (bool):
+                Take tasks only in the canonical order.
+            best (Optional[int]):
+                Value of the best plans, found with best_value().
+
+        Yields:
+            Plan: The best plans, in the order of build_plans().
+        """
+        self._prepare(dry_pool, cycle, plan, canonical)
+
+        paths = self._direct_paths()
+        if paths is not None:
+            for path in paths:
+                yield self._make_plan(path)
+            return
+
+        if best is None:
+            best = self._search_best()
+        else:
+            self._best = best
 
-            del plan[-1]
+        try:
+            for value in self._build_plans(self._plan.value, -1):
+                if value == best and self._is_new():
+                    yield self._make_plan(self._path)
+        finally:
+            # the iteration can be stopped in the middle
+            self._unwind()
+            self._committed = set()
+            self._memo.clear()
 
-            self.energy_left += work_done.amount
-            task["spent"] -= work_done.amount
+    def _search_best(self):
+        """Search through the plans for the best value.
+
+        Returns:
+            int: Value of the best plans.
+        """
+        for value in self._build_plans(self._plan.value, -1):
+            self._raise_incumbent(value)
+
+        self._committed = set()
+        self._memo.clear()
+        return self._best
+
+    def _prepare(
+        self,
+        dry_pool,
+        cycle,
+        plan,
+        canonical,
+        time_limit=None,
+        max_nodes=None,
+        max_plans=None,
+        tolerance=0,
+        symmetric_to=None,
+    ):
+        """Prepare the energoton to build plans.
+
+        Args:
+            dry_pool (work.dry_pool.DryPool): Tasks to be solved.
+            cycle (int): Number of the work cycle.
+            plan (Optional[Plan]): Plan to continue.
+            canonical (bool): Take tasks only in the canonical order.
+            time_limit (Optional[float]): Seconds to build plans in.
+            max_nodes (Optional[int]): Number of search steps.
+            max_plans (Optional[int]): Maximum number of plans to keep.
+            tolerance (int): Keep plans worse than the best by this value.
+            symmetric_to (Optional[Tuple[Tuple[Tuple[int, int]], int]]):
+                Work of an interchangeable energoton on the previous
+                step, and its value.
+        """
+        if max_plans is not None and max_plans < 1:
+            raise ValueError("The number of plans must be greater than 0.")
+
+        self._max_plans = max_plans
+        self._tolerance = tolerance
+        self._kept = None
+
+        self._mirror = None
+        if symmetric_to is not None:
+            done, value = symmetric_to
+            done_mask = 0
+            for ind, _ in done:
+                done_mask |= 1 << ind
+
+            self._mirror = (tuple(sorted(done)), value, done_mask)
+
+        self.optimal = True
+        self._excluded = 0
+        self._nodes = 0
+        self._budget = None
+        if time_limit is not None or max_nodes is not None:
+            self._budget = (
+                max_nodes,
+                None if time_limit is None else time.monotonic() + time_limit,
+            )
 
-    def build_plans(self, dry_pool, cycle=1, plan=None):
         self._dry_pool = dry_pool
+        self._canonical = canonical
+        self._cycle = cycle
+        self._plan = plan or Plan()
+        if not hasattr(self._plan, "spent"):
+            self._plan.commit()
+        self._path = []
+
+        # units out of the dry pool don't change during
+        # the search, so the tasks they make not actual
+        # stay not actual all the time
+        self._blockers = dry_pool.blockers
+        self._alternatives = dry_pool.alternatives
+        self._never = 0
+        for ind, (blockers, alternatives) in dry_pool.outer.items():
+            if any(not unit.is_solved for unit in blockers) or any(
+                unit.is_solved for unit in alternatives
+            ):
+                self._never |= 1 << ind
 
-        plans = []
-        self._build_plans(
-            task=None,
-            plan=plan or Plan(),
-            tasks=list(dry_pool.values()),
-            plans=plans,
-            cycle=cycle,
+        # solved tasks are kept as a bitmask
+        self._solved = 0
+        for ind in range(len(dry_pool)):
+            if dry_pool.is_solved(ind):
+                self._solved |= 1 << ind
+        self._start_solved = self._solved
+
+        # if none of the tasks to do depends on the work of the
+        # previous energoton, every plan taking a task going
+        # before that work is independent of it and sorts
+        # before it, so such plans are mirrored, if they
+        # are as valuable as the previous work
+        self._mirror_first = -1
+        if self._mirror is not None and self._mirror[0]:
+            done, _, done_mask = self._mirror
+            if not any(
+                done_mask >> ind & 1 or self._blockers[ind] & done_mask
+                for ind in range(len(dry_pool))
+                if not self._solved >> ind & 1
+            ):
+                self._mirror_first = done[0][0]
+
+        # affordable tasks are looked up with
+        # bisect over the amounts left to do
+        self._by_todo = sorted(
+            (
+                ind
+                for ind in range(len(dry_pool))
+                if not dry_pool.is_solved(ind)
+            ),
+            key=dry_pool.todo,
         )
-        return plans
+        self._todos = [dry_pool.todo(ind) for ind in self._by_todo]
+
+        order = self._by_todo
+        if canonical:
+            order = self._canonical_order(order)
+
+        self._rank = [0] * len(dry_pool)
+        for rank, ind in enumerate(order):
+            self._rank[ind] = rank
+
+        self._by_density = sorted(
+            self._by_todo,
+            key=lambda ind: dry_pool.value[ind] / dry_pool.todo(ind),
+            reverse=True,
+        )
+
+        self._classes = []
+        self._twin = [-1] * len(dry_pool)
+
+        self._best = -1
+        self._committed = set()
+        self._memo.clear()
+
+    def _group_identical(self):
+        """Group the identical tasks into classes.
+
+        Tasks of the same cost and value without relations
+        are interchangeable, so the search takes them in the
+        order of the indices, and the rest of the choices are
+        made, when plans are committed.
+        """
+        dry_pool = self._dry_pool
+
+        classes = {}
+        for ind in sorted(self._by_todo):
+            if not dry_pool.tasks[ind]._relations:
+                key = (dry_pool.todo(ind), dry_pool.value[ind])
+                classes.setdefault(key, []).append(ind)
+
+        self._classes = [m for m in classes.values() if len(m) > 1]
+        if not self._classes:
+            return
+
+        self._class_of = [None] * len(dry_pool)
+        for members in self._classes:
+            for prev, ind in zip(members, members[1:]):
+                self._twin[ind] = prev
+            for ind in members:
+                self._class_of[ind] = members
+
+        self._start_todo = [dry_pool.todo(ind) for ind in range(len(dry_pool))]
+        self._position = [0] * len(dry_pool)
+        for pos, ind in enumerate(self._by_todo):
+            self._position[ind] = pos
+
+    def _independent_tasks(self):
+        """
+        Tasks, which can be worked on, if working on them
+        can't change which tasks can be worked on.
+
+        Relations with solved tasks and tasks out of the dry
+        pool stay the same during plan building, so only
+        relations between the tasks to do are checked.
+
+        Returns:
+            Optional[List[int]]:
+                Indices of the tasks, sorted by the amount to
+                do. None, if the tasks are related to each other.
+        """
+        related = self._dry_pool.related
+        tasks = [ind for ind in self._by_todo if self._is_actual(ind)]
+        for ind in tasks:
+            if related[ind] & ~self._solved:
+                return None
+
+        return tasks
+
+    def _direct_paths(self):
+        """Find the best plans without a search, if possible.
+
+        Returns:
+            Optional[Iterable[List[Tuple[int, int]]]]:
+                Work of the best plans, as indices of the tasks
+                and amounts of energy spent. None, if the
+                plans can't be found without a search.
+        """
+        if self._tolerance:
+            # only the best plans are found directly
+            return None
+
+        tasks = self._independent_tasks()
+        if tasks is None:
+            return None
+
+        paths = self._solve_directly(tasks)
+        if paths is None or self._mirror is None:
+            return paths
+
+        dry = self._dry_pool
+        return (
+            path
+            for path in paths
+            if not self._is_mirrored(
+                path,
+                self._plan.value + sum(dry.value[ind] for ind, _ in path),
+            )
+        )
+
+    def _solve_directly(self, tasks):
+        """
+        Find the best plans for tasks independent of each
+        other without searching through the possible plans.
+
+        Args:
+            tasks (List[int]):
+                Indices of the tasks, sorted by the amount to do.
+
+        Returns:
+            Optional[Iterable[List[Tuple[int, int]]]]:
+                Work of the best plans, None if the energoton
+                has no way to find them directly.
+        """
+        return None
 
     def work(self, task, cycle=1):
         energy_spent = min(self.energy_left, task["cost"] - task["spent"])
@@ -111,30 +1165,409 @@ class Energoton(Id):
             cycle,
         )
 
-    def _is_actual(self, task_id):
-        if not self.pool.children[task_id].relations:
-            return True
+    def _is_actual(self, ind):
+        solved = self._solved
+        blockers = self._blockers[ind]
+        return not (
+            self._never >> ind & 1
+            or solved & blockers != blockers
+            or solved & self._alternatives[ind]
+        )
 
-        for rel in self.pool.children[task_id].relations.values():
-            if isinstance(rel, Blocking):
-                if rel.blocked.id == task_id:
-                    dry = self._dry_pool[rel.blocker.id]
-                    if dry["spent"] < dry["cost"]:
-                        return False
-            else:
-                for alt in rel.alternatives:
-                    dry = self._dry_pool[alt.id]
-                    if dry["spent"] == dry["cost"]:
-                        return False
 
-        return True
+def _next_choice(choice, size):
+    """Next choice of the tasks out of a class of identical tasks.
+
+    Choices go in the lexicographical order of the tasks
+    done in full, and then of the task done partially.
+
+    Args:
+        choice (Tuple[Tuple[int], Optional[int]]):
+            Positions of the tasks done in full in the
+            class, and of the task done partially.
+        size (int): Number of the tasks in the class.
+
+    Returns:
+        Optional[Tuple[Tuple[int], Optional[int]]]:
+            The next choice, None if it was the last one.
+    """
+    full, partial = choice
+    if partial is not None:
+        for pos in range(partial + 1, size):
+            if pos not in full:
+                return full, pos
+
+    count = len(full)
+    for i in reversed(range(count)):
+        if full[i] < size - count + i:
+            break
+    else:
+        return None
+
+    full = full[:i] + tuple(range(full[i] + 1, full[i] + 1 + count - i))
+    if partial is None:
+        return full, None
+
+    return full, next(pos for pos in range(size) if pos not in full)
+
+
+# processes building plans in parallel, shared by all the
+# energotons, and the values of the best plans found by
+# every parallel search, one slot per running search
+_workers = None
+_slots = 64
+_free_slots = list(range(_slots))
+_workers_lock = threading.Lock()
+_jobs = itertools.count()
+
+
+def _worker_pool(workers):
+    """Processes to build plans in parallel.
+
+    The processes are started once, and re-used by all the
+    parallel searches. If more processes are asked for, the
+    pool is replaced with a bigger one, and the old one shuts
+    down, once the searches running in it are over.
+
+    Args:
+        workers (int): Number of processes.
+
+    Returns:
+        Tuple[concurrent.futures.ProcessPoolExecutor, multiprocessing.Array]:
+            The processes, and the values of the best plans
+            found by the parallel searches.
+    """
+    global _workers
+
+    with _workers_lock:
+        if _workers is None or _workers[2] < workers:
+            shared = multiprocessing.Array("q", _slots)
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(shared,),
+            )
+            _workers = executor, shared, workers
+
+        return _workers[:2]
+
+
+def _take_slot(shared):
+    """Take a slot for the value of the best plan of a search.
+
+    Args:
+        shared (multiprocessing.Array): Values of the best plans.
+
+    Returns:
+        Optional[int]:
+            Index of the slot, None if all the slots are taken,
+            so that the workers don't share the value.
+    """
+    with _workers_lock:
+        if not _free_slots:
+            return None
+
+        slot = _free_slots.pop()
+
+    shared[slot] = -1
+    return slot
+
+
+def _free_slot(slot):
+    """Return a slot taken by a search.
+
+    Args:
+        slot (Optional[int]): Index of the slot.
+    """
+    if slot is not None:
+        with _workers_lock:
+            _free_slots.append(slot)
+
+
+def _init_worker(shared):
+    """Prepare a process to build plans in parallel.
+
+    Args:
+        shared (multiprocessing.Array):
+            Values of the best plans found by the parallel searches.
+    """
+    global _shared, _job
+
+    _shared = shared
+    _job = None
+
+
+def _build_branch(job, ind, excluded):
+    """Build the best plans starting with the given task.
+
+    Args:
+        job (Tuple[int, bytes, Optional[int]]):
+            Number of the search, the pickled energoton ready
+            to build plans, and the slot of the search for the
+            value of the best plan.
+        ind (int): Index of the first task.
+        excluded (int):
+            Bitmask of the tasks, which the plans of
+            the branch mustn't solve.
+
+    Returns:
+        Tuple[List[Tuple[int, Tuple[Tuple[int, int]]]], bool]:
+            Values of the plans and the work added to the initial
+            plan, as indices of the tasks and amounts spent, and
+            True if the process didn't run out of its budget.
+    """
+    global _job
+
+    number, energoton, slot = job
+    if _job is None or _job[0] != number:
+        # the energoton is loaded once per search in every process
+        _job = number, pickle.loads(energoton)
+
+    e = _job[1]
+    if slot is not None:
+        e._shared = _shared
+        e._slot = slot
+
+    e._excluded = excluded
+    e._best = -1
+    e._committed = set()
+    e._memo.clear()
+    plans = e._collect(
+        e._step(ind, e._plan.value, e._rank[ind] if e._canonical else -1)
+    )
+    return e._paths(plans), e.optimal
 
 
 class DeterministicEnergoton(Energoton):
+    solves_partially = False
+
+    def _solve_directly(self, tasks):
+        """
+        Find the best plans as solutions of the 0/1 knapsack
+        problem: tasks are items with the amounts to do as
+        weights and priority values as values, and the
+        energy left is the capacity.
+
+        Args:
+            tasks (List[int]):
+                Indices of the tasks, sorted by the amount to do.
+
+        Returns:
+            Optional[Iterator[List[Tuple[int, int]]]]:
+                Work of the best plans, None if the table is too big.
+        """
+        dry = self._dry_pool
+        energy = self.energy_left
+        items = [ind for ind in tasks if dry.todo(ind) <= energy]
+        if len(items) * (energy + 1) > self.knapsack_size:
+            return None
+
+        # best[i][c] is the best value the tasks
+        # from i-th on can give for c energy
+        best = [array.array("q", bytes(8 * (energy + 1)))]
+        for ind in reversed(items):
+            todo = dry.cost[ind] - dry.spent[ind]
+            value = dry.value[ind]
+
+            prev = best[-1]
+            row = array.array("q", prev)
+            for c in range(todo, energy + 1):
+                if prev[c - todo] + value > row[c]:
+                    row[c] = prev[c - todo] + value
+
+            best.append(row)
+
+        best.reverse()
+        return self._walk_knapsack(items, best)
+
+    def _walk_knapsack(self, items, best):
+        """Walk through all the best sets of tasks.
+
+        Every task has a positive value, so a best set of
+        tasks is maximal. The sets are walked through taking
+        tasks first, which gives the same order of plans
+        as the search does.
+
+        Args:
+            items (List[int]): Indices of the tasks.
+            best (List[array.array]): The knapsack table.
+
+        Yields:
+            List[Tuple[int, int]]:
+                Indices of the tasks and amounts of energy spent.
+        """
+        dry = self._dry_pool
+        path = []
+        stack = [(0, self.energy_left, 0)]
+        while stack:
+            i, c, depth = stack.pop()
+            del path[depth:]
+
+            while best[i][c]:
+                ind = items[i]
+                todo = dry.cost[ind] - dry.spent[ind]
+
+                take = (
+                    todo <= c
+                    and best[i + 1][c - todo] + dry.value[ind] == best[i][c]
+                )
+                if take:
+                    if best[i + 1][c] == best[i][c]:
+                        stack.append((i + 1, c, len(path)))
+
+                    path.append((ind, todo))
+                    c -= todo
+
+                i += 1
+
+            yield list(path)
+            if self._budget is not None and self._out_of_budget():
+                break
+
+    def _state(self):
+        # a task is either solved in full or untouched, so
+        # the set of the solved tasks defines the energy left
+        return self._solved ^ self._start_solved
+
     def can_solve(self, task):
         return self.energy_left >= task["cost"] - task["spent"]
 
 
 class NonDeterministicEnergoton(Energoton):
+    solves_partially = True
+
     def can_solve(self, _):
         return True
+
+    def _upper_bound(self, energy, last=-1):
+        # a partially done task counts in full, so on top of
+        # the fractional knapsack one more task can be touched
+        dry = self._dry_pool
+        top = 0
+        for ind in self._by_density:
+            if dry.spent[ind] < dry.cost[ind]:
+                top = max(top, dry.value[ind])
+
+        return super()._upper_bound(energy - 1, last) + top
+
+    def _solve_directly(self, tasks):
+        """
+        Find the best plans without a search.
+
+        A plan is a set of tasks solved in full, which takes
+        less energy than there is, and one more task, which
+        gets the rest of the energy. Every task adds its
+        value, so the best plans are the best sets of tasks
+        with one task marked to get the rest of the energy,
+        in which the rest of the tasks take at most the
+        energy minus one. The sets are found with a knapsack
+        table, where the mark is a part of the state.
+
+        Args:
+            tasks (List[int]):
+                Indices of the tasks, sorted by the amount to do.
+
+        Returns:
+            Optional[List[List[Tuple[int, int]]]]:
+                Work of the best plans, None if the table is too big.
+        """
+        dry = self._dry_pool
+        energy = self.energy_left
+        if not tasks or not energy:
+            return None
+
+        todos = [dry.cost[ind] - dry.spent[ind] for ind in tasks]
+        if sum(todos) <= energy:
+            return [list(zip(tasks, todos))]
+
+        if 2 * len(tasks) * energy > self.knapsack_size:
+            return None
+
+        # best[marked][i][c] is the best value the tasks from i-th
+        # on can give, if the tasks solved in full take at most c
+        # energy, and a task is already marked to get the rest
+        impossible = -(2**62)
+        best = (
+            [array.array("q", [0] * energy)],
+            [array.array("q", [impossible] * energy)],
+        )
+        for ind, todo in zip(reversed(tasks), reversed(todos)):
+            value = dry.value[ind]
+
+            full = best[0][-1]
+            row = array.array("q", full)
+            for c in range(todo, energy):
+                row[c] = max(row[c], full[c - todo] + value)
+
+            marked = best[1][-1]
+            mark_row = array.array("q", marked)
+            for c in range(energy):
+                mark_row[c] = max(mark_row[c], full[c] + value)
+                if c >= todo:
+                    mark_row[c] = max(mark_row[c], marked[c - todo] + value)
+
+            best[0].append(row)
+            best[1].append(mark_row)
+
+        best[0].reverse()
+        best[1].reverse()
+
+        # walk through all the best sets of tasks: decisions on
+        # tasks are paths of (task position, is marked) pairs
+        found = []
+        path = []
+        stack = [(0, energy - 1, 1, 0, None)]
+        while stack:
+            i, c, mark, depth, choice = stack.pop()
+            del path[depth:]
+            if choice is not None:
+                path.append(choice)
+
+            while i < len(tasks):
+                target = best[mark][i][c]
+                todo = todos[i]
+                value = dry.value[tasks[i]]
+
+                options = []
+                if best[mark][i + 1][c] == target:
+                    options.append((c, mark, None))
+                if todo <= c and best[mark][i + 1][c - todo] + value == target:
+                    options.append((c - todo, mark, (i, False)))
+                if mark and best[0][i + 1][c] + value == target:
+                    options.append((c, 0, (i, True)))
+
+                for option in options[1:]:
+                    stack.append((i + 1, *option[:2], len(path), option[2]))
+
+                c, mark, choice = options[0]
+                if choice is not None:
+                    path.append(choice)
+
+                i += 1
+
+            found.append(list(path))
+            if self._budget is not None and self._out_of_budget():
+                break
+
+        # the search finds a plan first by taking the tasks
+        # solved in full in order, and then the partial one
+        by_order = {}
+        for path in found:
+            solved = [i for i, marked in path if not marked]
+            rest = next(i for i, marked in path if marked)
+            spent = sum(todos[i] for i in solved)
+
+            if spent + todos[rest] > energy:
+                order = (*solved, rest)
+                work = [(tasks[i], todos[i]) for i in solved]
+                work.append((tasks[rest], energy - spent))
+            else:
+                # the marked task takes exactly the rest of the
+                # energy, so the plan is the same for every one
+                # of its tasks marked
+                order = tuple(sorted((*solved, rest)))
+                work = [(tasks[i], todos[i]) for i in order]
+
+            by_order.setdefault(order, work)
+
+        return [by_order[order] for order in sorted(by_order)]
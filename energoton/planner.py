@@ -1,8 +1,36 @@
 import copy
+import heapq
+import time
+
+from work import DryPool, WorkDone
+
+
+def _id_key(work):
+    """Sort key ordering work by the task ids.
+
+    Ids of different types (e.g. generated integers and
+    UUIDs, when the generation was switched mid-process)
+    aren't comparable, so they're grouped by type first.
+
+    Args:
+        work (work.work_unit.WorkDone): Work to order.
+
+    Returns:
+        Tuple[str, Any]: The id type name and the id.
+    """
+    id_ = work.task.id
+    return type(id_).__name__, id_
 
 
 class Plan(list):
-    def commit(self):
+    def commit(self, spent=None):
+        """Calculate the plan totals.
+
+        Args:
+            spent (Optional[Dict[Any, int]]):
+                Energy spent on every task of the plan, by
+                task ids. Calculated, if not provided.
+        """
         self.value = 0
         self.energy_spent = 0
         dry = []
@@ -13,6 +41,34 @@ class Plan(list):
             dry.append(w.dry)
 
         self.dry = tuple(dry)
+        self._hash = hash(self.dry)
+
+        if spent is None:
+            spent = {}
+            for w in self:
+                spent[w.task.id] = spent.get(w.task.id, 0) + w.amount
+
+        self.spent = spent
+
+    def extended(self, works):
+        """Build a plan continuing this one with the given work.
+
+        Args:
+            works (List[work.work_unit.WorkDone]): Work to add.
+
+        Returns:
+            Plan: The committed plan.
+        """
+        if not hasattr(self, "spent"):
+            self.commit()
+
+        spent = self.spent.copy()
+        for w in works:
+            spent[w.task.id] = spent.get(w.task.id, 0) + w.amount
+
+        plan = Plan(sorted(self + works, key=_id_key))
+        plan.commit(spent)
+        return plan
 
     def calc_value(self):
         value = 0
@@ -21,7 +77,162 @@ class Plan(list):
         return value
 
     def __eq__(self, other):
-        return self.dry == other.dry
+        return self._hash == other._hash and self.dry == other.dry
+
+    def __hash__(self):
+        """Magic method for the hash function.
+
+        Plans are hashed by their short form, so
+        the plan must be committed before.
+
+        Returns:
+            int: Plan hash.
+        """
+        return self._hash
+
+
+class _Later:
+    """Heap key putting the later positions first.
+
+    Args:
+        order (Any): Position of the plan, comparable to the others.
+    """
+
+    __slots__ = ("order",)
+
+    def __init__(self, order):
+        self.order = order
+
+    def __lt__(self, other):
+        return other.order < self.order
+
+    def __eq__(self, other):
+        return self.order == other.order
+
+
+class BestPlans:
+    """The best plans found.
+
+    Plans are kept in a heap, so that the worst of them is
+    dropped, when there are too many plans. Out of plans
+    of the same value, the ones found first are kept.
+    The `dropped` attribute tells, if any plans good
+    enough for the tolerance were dropped for the limit.
+
+    Args:
+        max_plans (Optional[int]): Maximum number of plans to keep.
+        tolerance (int):
+            Keep plans, which are worse than the
+            best one by at most this value.
+    """
+
+    def __init__(self, max_plans=None, tolerance=0):
+        if max_plans is not None and max_plans < 1:
+            raise ValueError("The number of plans must be greater than 0.")
+
+        self.max_plans = max_plans
+        self.tolerance = tolerance
+        self.best = -1
+        self.dropped = False
+
+        # (value, later position, plan) tuples, so
+        # that the worst plan is on top of the heap
+        self._heap = []
+        self._count = 0
+        self._kept = set()
+        self._ordered = False
+
+        # plans to come are known to go after this position
+        self.horizon = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __iter__(self):
+        """Iterate over the plans, the best first.
+
+        Yields:
+            Plan: The plans, equal ones in the order they were found.
+        """
+        for _, _, plan in sorted(
+            self._heap, key=lambda e: (-e[0], e[1].order)
+        ):
+            yield plan
+
+    def __contains__(self, plan):
+        return plan in self._kept
+
+    @property
+    def floor(self):
+        """The lowest value of a plan to be kept.
+
+        Returns:
+            int: The lowest value, -1 if no plans were found yet.
+        """
+        if self.best < 0:
+            return -1
+
+        floor = self.best - self.tolerance
+        if self.max_plans is not None and len(self._heap) >= self.max_plans:
+            # plans found later lose to the equal ones
+            later = not self._ordered or (
+                self.horizon is not None
+                and self._heap[0][1].order < self.horizon
+            )
+            floor = max(floor, self._heap[0][0] + later)
+
+        return floor
+
+    def add(self, plan, order=None):
+        """Keep the plan, if it's good enough.
+
+        Args:
+            plan (Plan): The plan to keep.
+            order (Optional[Tuple[int]]):
+                Position of the plan among the equally good
+                ones. By default, plans go in the order they
+                were added.
+
+        Returns:
+            bool: True if the plan is kept.
+        """
+        if plan.value < self.floor:
+            if plan.value >= self.best - self.tolerance:
+                self.dropped = True
+            return False
+
+        if order is None:
+            self._count += 1
+            order = self._count
+        else:
+            self._ordered = True
+
+        entry = (plan.value, _Later(order), plan)
+        if (
+            self.max_plans is not None
+            and len(self._heap) >= self.max_plans
+            and entry[:2] < self._heap[0][:2]
+        ):
+            self.dropped = True
+            return False
+
+        heapq.heappush(self._heap, entry)
+        self._kept.add(plan)
+
+        if plan.value > self.best:
+            self.best = plan.value
+            while self._heap[0][0] < self.best - self.tolerance:
+                self._drop()
+
+        if self.max_plans is not None and len(self._heap) > self.max_plans:
+            self._drop()
+            self.dropped = True
+
+        return True
+
+    def _drop(self):
+        """Drop the worst plan."""
+        self._kept.discard(heapq.heappop(self._heap)[2])
 
 
 class Planner:
@@ -29,12 +240,15 @@ class Planner:
     Planner builds plans for the given pool
     and provides methods to analyze them.
 
-    NOTE: On init, Planner makes a deep copy
-    of the given pool. It sticks the planner
-    to the pool, and allows to re-use the pool
-    in multiple planners (e.g. you have 2 teams and
-    you want to compare how they'll handle the same
-    pool of tasks, running planners in parallel).
+    NOTE: On init, Planner takes a copy-on-write
+    snapshot of the given pool: pools are copied,
+    while tasks are shared with the given pool and
+    cloned only when the planner records work on
+    them. The planner never changes the given pool,
+    which allows to re-use the pool in multiple
+    planners (e.g. you have 2 teams and you want to
+    compare how they'll handle the same pool of
+    tasks, running planners in parallel).
 
     Args:
         pool (work.pool.Pool):
@@ -47,12 +261,328 @@ class Planner:
                 f"The given pool {pool.id} - {pool.name} is empty."
             )
 
-        self._pool = copy.deepcopy(pool)
-        self._dry_pool = self._pool.dry
+        self._pool = pool.snapshot()
+        self._dry_pool = self._whole_dry_pool = self._pool.dry
+        self._blocking = self._order_blocking(self._dry_pool)
+
+        self._plans = [self._empty_plan()]
+        self.optimal = True
+
+    def build_plans(
+        self,
+        energotons,
+        cycles=1,
+        canonical=False,
+        workers=None,
+        executor=None,
+        time_limit=None,
+        max_nodes=None,
+        max_plans=None,
+        tolerance=0,
+        break_symmetry=False,
+    ):
+        """Build the best plans for the given energotons.
+
+        If the time or the nodes limit is hit, the best plans
+        found so far are returned, and the `optimal` attribute
+        of the planner is set to False. Otherwise, it's True.
+
+        Args:
+            energotons (List[energoton.energoton.Energoton]):
+                Energotons to work on the pool.
+            cycles (int): Number of work cycles to plan.
+            canonical (bool):
+                Make energotons consider every set of tasks
+                once, instead of once per its permutation.
+            workers (Optional[int]):
+                Number of processes every energoton
+                uses to build plans in parallel.
+            executor (Optional[concurrent.futures.Executor]):
+                Thread or process pool to continue the
+                plans of every step concurrently.
+            time_limit (Optional[float]):
+                Seconds to build plans in.
+            max_nodes (Optional[int]):
+                Number of search steps every
+                energoton search is limited to.
+            max_plans (Optional[int]):
+                Maximum number of plans to keep on every step.
+                Out of equally good plans the ones found first
+                are kept. Only the kept plans are continued on
+                the next step, so the limit works as a beam: if
+                plans are dropped before the last step, the best
+                plans may be lost, and `optimal` is set to False.
+            tolerance (int):
+                Keep also plans, which are worse than the
+                best one by at most this value. The plans
+                go from the best to the worst then.
+            break_symmetry (bool):
+                Build every assignment of the same work to
+                interchangeable energotons once. Energotons are
+                interchangeable, if they are of the same type
+                and take consecutive steps of a cycle with the
+                same charge. The plans are the same, but the
+                work can be assigned differently. Not used with
+                a tolerance, and once plans aren't proven to be
+                the best, as the swapped work may be lost then.
+
+        Returns:
+            Tuple[Plan]: The best plans.
+        """
+        steps = self._steps(energotons, cycles)
+
+        options = {
+            "canonical": canonical,
+            "workers": workers,
+            "max_nodes": max_nodes,
+            "max_plans": max_plans,
+            "tolerance": tolerance,
+        }
+        deadline = None
+        if time_limit is not None:
+            deadline = time.monotonic() + time_limit
+
+        previous = None
+        for i, (c, e) in enumerate(steps, start=1):
+            step = (c, e, e.energy_left)
+            if not (
+                break_symmetry
+                and not tolerance
+                and self.optimal
+                and self._interchangeable(previous, step)
+            ):
+                previous = None
+
+            new_plans = BestPlans(max_plans, tolerance)
+            self._plans = self._merge(
+                self._continue_plans(
+                    e, c, options, deadline, executor, previous
+                ),
+                new_plans,
+            )
+            if new_plans.dropped and i < len(steps):
+                # the dropped plans aren't continued
+                self.optimal = False
+
+            previous = step
+            e.recharge()
+
+        return self._plans
+
+    def iter_plans(self, energotons, cycles=1, canonical=False):
+        """Build the best plans for the given energotons one by one.
+
+        The plans of all the steps, except the last one, are
+        built as with build_plans(). On the last step, the
+        plans are yielded as soon as they are proven to be
+        the best, so that they aren't held all together.
+
+        Args:
+            energotons (List[energoton.energoton.Energoton]):
+                Energotons to work on the pool.
+            cycles (int): Number of work cycles to plan.
+            canonical (bool):
+                Make energotons consider every set of tasks
+                once, instead of once per its permutation.
+
+        Yields:
+            Plan: The best plans, in the order of build_plans().
+        """
+        steps = self._steps(energotons, cycles)
+        options = {"canonical": canonical}
+
+        for c, e in steps[:-1]:
+            self._plans = self._merge(
+                self._continue_plans(e, c, options, None, None), BestPlans()
+            )
+            e.recharge()
+
+        c, e = steps[-1]
+
+        # continuations of several plans can be the best,
+        # so the best value is found before yielding plans
+        values = [
+            e.best_value(self.dry_pool_after_plan(plan), c, plan, canonical)
+            for plan in self._plans
+        ]
+        best = max(values)
+        prefixes = [
+            plan for plan, value in zip(self._plans, values) if value == best
+        ]
+
+        # the same plan can continue different plans, so
+        # the plans, which contain the work of the plans
+        # continued later, are kept to skip their repeats
+        seen = set()
+        for i, plan in enumerate(prefixes):
+            later = [set(p.dry) for p in prefixes[i + 1 :]]
+
+            for new_plan in e.iter_plans(
+                self.dry_pool_after_plan(plan), c, plan, canonical, best
+            ):
+                if new_plan in seen:
+                    continue
+
+                if later:
+                    work = set(new_plan.dry)
+                    if any(p <= work for p in later):
+                        seen.add(new_plan)
+
+                yield new_plan
+
+    @staticmethod
+    def _order_blocking(dry_pool):
+        """Check the blocking relations between the tasks to do.
+
+        The tasks are put into topological levels, so
+        that every task goes after all its blockers.
+
+        Args:
+            dry_pool (work.dry_pool.DryPool): Tasks to do.
+
+        Raises:
+            ValueError: If the tasks block each other in a loop.
+
+        Returns:
+            Tuple[List[int], List[Optional[List[int]]]]:
+                Indexes of the tasks in the order of the levels,
+                and the direct blockers of every task. None for
+                the tasks, which are blocked by unsolved units
+                out of the pool, directly or not.
+        """
+        count = len(dry_pool)
+        direct = [[] for _ in range(count)]
+        blocked = [[] for _ in range(count)]
+        for ind in range(count):
+            mask = dry_pool.blockers[ind]
+            while mask:
+                blocker = (mask & -mask).bit_length() - 1
+                mask &= mask - 1
+
+                direct[ind].append(blocker)
+                blocked[blocker].append(ind)
+
+        blockers = [len(d) for d in direct]
+        order = [ind for ind in range(count) if not blockers[ind]]
+        for ind in order:
+            for blocked_ind in blocked[ind]:
+                blockers[blocked_ind] -= 1
+                if not blockers[blocked_ind]:
+                    order.append(blocked_ind)
+
+        if len(order) < count:
+            loop = [dry_pool.ids[ind] for ind in range(count) if blockers[ind]]
+            raise ValueError(f"Tasks {loop} block each other in a loop.")
+
+        for ind in order:
+            outer = dry_pool.outer.get(ind, ((), ()))[0]
+            if any(not unit.is_solved for unit in outer) or any(
+                direct[blocker] is None for blocker in direct[ind]
+            ):
+                direct[ind] = None
+
+        return order, direct
+
+    def _unblockable(self, energy):
+        """Check which tasks can be unblocked with the given energy.
+
+        The energy to spend on all the blockers of a task,
+        directly or not, is bounded from below by its most
+        expensive chain of blockers, and from above by the
+        sum over its direct blockers, which counts shared
+        blockers more than once. Both are accumulated in
+        the order of the levels, capped by the energy.
+        Only the tasks, which the bounds don't decide for,
+        walk their blockers, stopping once the energy ends.
+
+        Args:
+            energy (int): Energy the energotons have.
+
+        Returns:
+            List[bool]:
+                True for the tasks, blockers of which take
+                less than the given energy, False otherwise.
+        """
+        dry_pool = self._whole_dry_pool
+        order, direct = self._blocking
+
+        count = len(dry_pool)
+        lower = [0] * count
+        upper = [0] * count
+        unblockable = [False] * count
+        for ind in order:
+            if direct[ind] is None:
+                continue
+
+            for blocker in direct[ind]:
+                todo = dry_pool.todo(blocker)
+                lower[ind] = max(lower[ind], lower[blocker] + todo)
+                upper[ind] = min(energy, upper[ind] + upper[blocker] + todo)
+
+            if upper[ind] < energy:
+                unblockable[ind] = True
+            elif lower[ind] < energy:
+                spent = 0
+                seen = {ind}
+                stack = list(direct[ind])
+                while stack and spent < energy:
+                    blocker = stack.pop()
+                    if blocker not in seen:
+                        seen.add(blocker)
+                        spent += dry_pool.todo(blocker)
+                        stack.extend(direct[blocker])
+
+                unblockable[ind] = spent < energy
+
+        return unblockable
+
+    def _reachable_dry_pool(self, energotons, cycles):
+        """Dry pool of the tasks, which can be worked on at all.
+
+        A task can't be worked on, if its blockers take
+        all the energy the energotons have in all the cycles.
+
+        Args:
+            energotons (List[energoton.energoton.Energoton]):
+                Energotons to work on the pool.
+            cycles (int): Number of work cycles to plan.
+
+        Returns:
+            work.dry_pool.DryPool: The tasks, which can be worked on.
+        """
+        energy = 0
+        for e in energotons:
+            energy += e.energy_left
+            if isinstance(e.capacity, int):
+                energy += e.capacity * (cycles - 1)
+            else:
+                energy += sum(e.capacity[: cycles - 1])
+
+        dry_pool = self._whole_dry_pool
+        reachable = [
+            task
+            for task, unblockable in zip(
+                dry_pool.tasks, self._unblockable(energy)
+            )
+            if unblockable
+        ]
+        if len(reachable) == len(dry_pool):
+            return dry_pool
+
+        return DryPool(reachable)
+
+    def _steps(self, energotons, cycles):
+        """Prepare the planning steps.
 
-        self._plans = [Plan()]
+        Args:
+            energotons (List[energoton.energoton.Energoton]):
+                Energotons to work on the pool.
+            cycles (int): Number of work cycles to plan.
 
-    def build_plans(self, energotons, cycles=1):
+        Returns:
+            List[Tuple[int, energoton.energoton.Energoton]]:
+                Work cycle and energoton of every step.
+        """
         if len(energotons) == 0:
             raise ValueError("No energotons provided for planning.")
 
@@ -65,50 +595,191 @@ class Planner:
         for e in energotons:
             e.pool = self._pool
 
-        self._plans = (Plan(),)
-
-        for c in range(1, cycles + 1):
-            for e in energotons:
-                new_plans = []
-                for plan in self._plans:
-                    for new_plan in e.build_plans(
-                        self.dry_pool_after_plan(plan),
-                        c,
-                        plan,
-                    ):
-                        if new_plans:
-                            if new_plan.value < new_plans[0].value:
-                                continue
-
-                            if new_plan.value > new_plans[0].value:
-                                new_plans.clear()
+        self._dry_pool = self._reachable_dry_pool(energotons, cycles)
+        self._plans = (self._empty_plan(),)
+        self.optimal = True
+
+        return [(c, e) for c in range(1, cycles + 1) for e in energotons]
+
+    def _merge(self, continued, new_plans):
+        """Merge the best plans continuing the current ones.
+
+        Args:
+            continued (Iterable[Tuple[List[Plan], bool]]):
+                Plans continuing every current plan, and
+                True if they are proven to be the best.
+            new_plans (BestPlans): Container for the best plans.
+
+        Returns:
+            Tuple[Plan]: The best plans.
+        """
+        for built, optimal in continued:
+            self.optimal = self.optimal and optimal
+            if (
+                new_plans.max_plans is not None
+                and len(built) >= new_plans.max_plans
+            ):
+                # the search could have dropped plans for the limit
+                new_plans.dropped = True
+
+            for new_plan in built:
+                if new_plan.value >= new_plans.floor and (
+                    new_plan not in new_plans
+                ):
+                    new_plans.add(new_plan)
+
+        return tuple(new_plans)
 
-                        if new_plan not in new_plans:
-                            new_plans.append(new_plan)
-
-                self._plans = tuple(new_plans)
-                e.recharge()
-
-        return self._plans
+    @staticmethod
+    def _interchangeable(previous, step):
+        """Check if the energotons of two steps are interchangeable.
+
+        Args:
+            previous (Optional[Tuple[int, Energoton, int]]):
+                Cycle, energoton and its charge on the previous step.
+            step (Tuple[int, Energoton, int]):
+                Cycle, energoton and its charge on the current step.
+
+        Returns:
+            bool: True if the energotons can swap their work.
+        """
+        if previous is None:
+            return False
+
+        c, e, charge = step
+        prev_c, prev_e, prev_charge = previous
+        return (
+            prev_c == c
+            and type(prev_e) is type(e)
+            and prev_charge == charge
+            and prev_e.id != e.id
+        )
+
+    def _step_work(self, plan, previous):
+        """Work done on the previous step of the plan.
+
+        Args:
+            plan (Plan): The plan.
+            previous (Tuple[int, Energoton, int]):
+                Cycle, energoton and its charge on the previous step.
+
+        Returns:
+            Tuple[Tuple[Tuple[int, int]], int]:
+                Indices of the tasks and amounts of energy
+                spent, and the value of the work.
+        """
+        cycle, energoton, _ = previous
+
+        done = []
+        value = 0
+        for w in plan:
+            if w.cycle == cycle and w.assignee.id == energoton.id:
+                done.append((self._dry_pool.index[w.task.id], w.amount))
+                value += w.task.priority.value
+
+        return tuple(done), value
+
+    def _continue_plans(
+        self, energoton, cycle, options, deadline, executor, previous=None
+    ):
+        """Build the best plans continuing every current plan.
+
+        Args:
+            energoton (energoton.energoton.Energoton):
+                Energoton to continue the plans.
+            cycle (int): Number of the work cycle.
+            options (Dict[str, Any]): Plan building options.
+            deadline (Optional[float]):
+                Time.monotonic() value to build plans until.
+            executor (Optional[concurrent.futures.Executor]):
+                Pool to build the plans concurrently.
+            previous (Optional[Tuple[int, Energoton, int]]):
+                Cycle, energoton and its charge on the previous
+                step, if the energoton is interchangeable with
+                the one building the plans.
+
+        Yields:
+            Tuple[List[Plan], bool]:
+                The best plans continuing the current ones, in
+                the order of the current plans, and True if the
+                plans are proven to be the best.
+        """
+        if executor is None:
+            for i, plan in enumerate(self._plans):
+                if i and _time_left(deadline) == 0:
+                    # out of time, the rest of the plans aren't continued
+                    yield [], False
+                    return
+
+                plans = energoton.build_plans(
+                    self.dry_pool_after_plan(plan),
+                    cycle,
+                    plan,
+                    time_limit=_time_left(deadline),
+                    symmetric_to=previous and self._step_work(plan, previous),
+                    **options,
+                )
+                yield plans, energoton.optimal
+            return
+
+        current = self._plans
+        if _time_left(deadline) == 0:
+            current = current[:1]
+
+        futures = [
+            executor.submit(
+                _continue_plan,
+                energoton,
+                self.dry_pool_after_plan(plan),
+                cycle,
+                plan,
+                dict(
+                    options,
+                    symmetric_to=previous and self._step_work(plan, previous),
+                ),
+                deadline,
+            )
+            for plan in current
+        ]
+        for plan, future in zip(current, futures):
+            paths, optimal = future.result()
+            # the plans are re-built of the planner's own
+            # objects, as the executor may return copies
+            plans = [
+                plan.extended(
+                    [
+                        WorkDone(
+                            self._dry_pool.tasks[ind], amount, energoton, cycle
+                        )
+                        for ind, amount in path
+                    ]
+                )
+                for path in paths
+            ]
+            yield plans, optimal
+
+        if len(current) < len(self._plans):
+            yield [], False
 
     def pool_after_plan(self, plan):
-        pool = copy.deepcopy(self._pool)
+        pool = self._pool.snapshot()
 
         for work_done in plan:
-            pool.children[work_done.task.id].work_done.append(work_done)
+            pool.record(work_done)
 
         return pool
 
     def dry_pool_after_plan(self, plan):
-        pool = copy.deepcopy(self._dry_pool)
+        if not hasattr(plan, "spent"):
+            plan.commit()
 
-        for work_done in plan:
-            task = pool[work_done.task.id]
-            task["spent"] += work_done.amount
-            if task["spent"] == task["cost"]:
-                del pool[work_done.task.id]
+        return self._dry_pool.overlay(plan.spent)
 
-        return pool
+    @staticmethod
+    def _empty_plan():
+        plan = Plan()
+        plan.commit()
+        return plan
 
     @staticmethod
     def by_cycles(plans):
@@ -141,3 +812,46 @@ class Planner:
             by_assignees.append(new_plan)
 
         return by_assignees
+
+
+def _time_left(deadline):
+    """Seconds left until the deadline.
+
+    Args:
+        deadline (Optional[float]): Time.monotonic() value.
+
+    Returns:
+        Optional[float]: Seconds left, None if there is no deadline.
+    """
+    if deadline is None:
+        return None
+
+    return max(deadline - time.monotonic(), 0)
+
+
+def _continue_plan(energoton, dry_pool, cycle, plan, options, deadline):
+    """Build the best plans continuing the given one in an executor.
+
+    Args:
+        energoton (energoton.energoton.Energoton):
+            Energoton to continue the plan.
+        dry_pool (work.dry_pool.DryPool): Pool after the plan.
+        cycle (int): Number of the work cycle.
+        plan (Plan): Plan to continue.
+        options (Dict[str, Any]): Plan building options.
+        deadline (Optional[float]):
+            Time.monotonic() value to build plans until.
+
+    Returns:
+        Tuple[List[Tuple[Tuple[int, int]]], bool]:
+            Work added to the plan by every built plan, as
+            indices of the tasks and amounts of energy spent,
+            and True if the plans are proven to be the best.
+    """
+    # the search state is kept in the energoton, so
+    # every concurrent search needs its own copy of it
+    energoton = copy.copy(energoton)
+    plans = energoton.build_plans(
+        dry_pool, cycle, plan, time_limit=_time_left(deadline), **options
+    )
+    return [path for _, path in energoton._paths(plans)], energoton.optimal
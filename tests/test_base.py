@@ -1,4 +1,5 @@
 import unittest
+import uuid
 
 from base.base import Id
 
@@ -18,3 +19,23 @@ class TestId(unittest.TestCase):
 
         unit2 = Id(unit1.id)
         self.assertEqual(unit1, unit2)
+
+    def test_int_ids(self):
+        Id.use_int_ids()
+        try:
+            unit1 = Id()
+            unit2 = Id()
+        finally:
+            Id.use_int_ids(False)
+
+        self.assertIsInstance(unit1.id, int)
+        self.assertLess(unit1.id, unit2.id)
+        self.assertIsInstance(Id().id, uuid.UUID)
+
+        # the exported UUIDs are stable and unique
+        self.assertEqual(unit1.uuid, unit1.uuid)
+        self.assertNotEqual(unit1.uuid, unit2.uuid)
+        self.assertEqual(unit1.uuid.version, 4)
+
+        unit3 = Id()
+        self.assertEqual(unit3.uuid, unit3.id)
@@ -0,0 +1,145 @@
+import pickle
+import unittest
+from unittest import mock
+
+from work import Alternative, Blocking, DryPool, Pool, Priority, Task, WorkDone
+
+
+class TestDryPool(unittest.TestCase):
+    def test_pool_dry(self):
+        t1 = Task(5, id_="1", priority=Priority("high"))
+        t2 = Task(2, id_="2")
+        t3 = Task(4, id_="3")
+        t3.work_done.append(WorkDone(t3, 4, mock.Mock()))
+
+        dry = Pool(children=[t1, t2, t3]).dry
+
+        self.assertEqual(len(dry), 2)
+        self.assertEqual(dry.ids, ["2", "1"])
+        self.assertEqual(dry.index, {"2": 0, "1": 1})
+        self.assertEqual(list(dry.cost), [2, 5])
+        self.assertEqual(list(dry.value), [4, 8])
+        self.assertEqual(dry.tasks, [t2, t1])
+
+    def test_todo(self):
+        task = Task(5)
+        task.work_done.append(WorkDone(task, 2, mock.Mock()))
+
+        dry = DryPool([task])
+        self.assertEqual(dry.todo(0), 3)
+        self.assertFalse(dry.is_solved(0))
+
+        dry.spent[0] += 3
+        self.assertEqual(dry.todo(0), 0)
+        self.assertTrue(dry.is_solved(0))
+
+    def test_copy(self):
+        dry = DryPool([Task(5), Task(3)])
+        copy = dry.copy()
+
+        copy.spent[0] = 5
+
+        self.assertEqual(dry.spent[0], 0)
+        self.assertIs(copy.cost, dry.cost)
+        self.assertIs(copy.index, dry.index)
+
+    def test_overlay(self):
+        t1 = Task(5, id_="1")
+        t2 = Task(3, id_="2")
+        dry = DryPool([t1, t2])
+
+        overlay = dry.overlay({"2": 3})
+        self.assertNotIn("spent", overlay.__dict__)
+        self.assertIs(overlay.cost, dry.cost)
+
+        self.assertTrue(overlay.is_solved(1))
+        self.assertEqual(list(overlay.spent), [0, 3])
+        self.assertEqual(list(dry.spent), [0, 0])
+
+        overlay = overlay.overlay({"1": 2})
+        self.assertEqual(list(overlay.spent), [2, 3])
+
+    def test_relations(self):
+        t1 = Task(1, id_="1")
+        t2 = Task(2, id_="2")
+        t3 = Task(3, id_="3")
+        outer = Task(4, id_="4")
+
+        Blocking(t1, t2)
+        Blocking(outer, t2)
+        Alternative(t2, t3)
+
+        dry = DryPool([t1, t2, t3])
+
+        self.assertEqual(dry.blockers, [0, 0b001, 0])
+        self.assertEqual(dry.alternatives, [0, 0b110, 0b110])
+        self.assertEqual(dry.related, [0b010, 0b101, 0b010])
+        self.assertEqual(dry.outer, {1: ([outer], [])})
+
+    def test_remove(self):
+        t1 = Task(1, id_="1")
+        t2 = Task(2, id_="2")
+        t3 = Task(3, id_="3")
+        Blocking(t1, t3)
+        Alternative(t1, t2)
+
+        dry = DryPool([t1, t2, t3])
+        copy = dry.copy()
+        dry.remove(0)
+
+        self.assertEqual(dry.ids, ["2", "3"])
+        self.assertEqual(dry.index, {"2": 0, "3": 1})
+        self.assertEqual(list(dry.cost), [2, 3])
+        self.assertEqual(dry.blockers, [0, 0])
+        self.assertEqual(dry.alternatives, [0b1, 0])
+        self.assertEqual(dry.outer, {0: ([], [t1]), 1: ([t1], [])})
+
+        # the copies keep the task
+        self.assertEqual(copy.ids, ["1", "2", "3"])
+        self.assertEqual(copy.blockers, [0, 0, 0b1])
+
+    def test_insert(self):
+        t1 = Task(1, id_="1")
+        t2 = Task(2, id_="2")
+        t3 = Task(3, id_="3")
+        Blocking(t1, t3)
+        Alternative(t1, t2)
+
+        dry = DryPool([t2, t3])
+        copy = dry.copy()
+        dry.insert(0, t1)
+
+        self.assertEqual(dry.ids, ["1", "2", "3"])
+        self.assertEqual(dry.index, {"1": 0, "2": 1, "3": 2})
+        self.assertEqual(list(dry.cost), [1, 2, 3])
+        self.assertEqual(dry.blockers, [0, 0, 0b1])
+        self.assertEqual(dry.alternatives, [0b11, 0b11, 0])
+        self.assertEqual(dry.related, [0b110, 0b1, 0b1])
+        self.assertEqual(dry.outer, {})
+
+        # the copies don't get the task
+        self.assertEqual(copy.ids, ["2", "3"])
+        self.assertEqual(copy.outer, {0: ([], [t1]), 1: ([t1], [])})
+
+    def test_splice_in_place(self):
+        tasks = [Task(i + 1, id_=str(i)) for i in range(4)]
+        Blocking(tasks[0], tasks[3])
+
+        dry = DryPool(tasks[1:])
+        ids, blockers = dry.ids, dry.blockers
+
+        # without copies alive the pool is changed in place,
+        # and the index is built anew only on the next access
+        dry.copy()
+        dry.insert(0, tasks[0])
+        dry.remove(1)
+
+        self.assertIs(dry.ids, ids)
+        self.assertIs(dry.blockers, blockers)
+        self.assertNotIn("index", dry.__dict__)
+        self.assertEqual(dry.index, {"0": 0, "2": 1, "3": 2})
+        self.assertEqual(dry.blockers, [0, 0, 0b1])
+
+        restored = pickle.loads(pickle.dumps(dry))
+        self.assertEqual(restored.ids, dry.ids)
+        self.assertEqual(restored.blockers, dry.blockers)
@@ -1,7 +1,11 @@
+import concurrent.futures
+import multiprocessing
 import unittest
+from unittest import mock
 
 from energoton import DeterministicEnergoton, NonDeterministicEnergoton
-from work import Alternative, Blocking, Pool, Task, WorkDone
+from energoton import energoton
+from work import Alternative, Blocking, Pool, Priority, Task, WorkDone
 from energoton.planner import Plan
 
 
@@ -176,3 +180,434 @@ class TestEnergoton(unittest.TestCase):
         e.recharge()
 
         self.assertEqual(e.energy_left, 0)
+
+    def test_upper_bound(self):
+        t1 = Task(4, id_="1", priority=Priority("high"))
+        t2 = Task(2, id_="2", priority=Priority("low"))
+        t3 = Task(4, id_="3", priority=Priority("normal"))
+        pool = Pool(children=[t1, t2, t3])
+
+        e = DeterministicEnergoton(7)
+        e.pool = pool
+        e.build_plans(pool.dry)
+
+        # t1 and t2 in full, and a quarter of t3
+        self.assertEqual(e._upper_bound(7), 11)
+        self.assertEqual(e._upper_bound(0), 0)
+
+        e = NonDeterministicEnergoton(7)
+        e.pool = pool
+        e.build_plans(pool.dry)
+
+        # t1 and t2 in full, plus the most valuable
+        # task, which can be touched with the last unit
+        self.assertEqual(e._upper_bound(7), 8 + 2 + 8)
+
+    def test_build_plans_pruned(self):
+        pool = Pool()
+        tasks = [Task(2, id_="0", priority=Priority("highest"))]
+        tasks.extend(Task(3, id_=str(i)) for i in range(1, 6))
+        for t in tasks:
+            pool.add(t)
+
+        def count_commits(e):
+            # make the energoton search for the plans
+            e.knapsack_size = 0
+            e.pool = pool
+            with mock.patch.object(
+                e, "_commit_plan", wraps=e._commit_plan
+            ) as commit:
+                plans = e.build_plans(pool.dry)
+
+            return plans, commit.call_count
+
+        plans, pruned = count_commits(DeterministicEnergoton(7))
+        with mock.patch.object(
+            DeterministicEnergoton, "_upper_bound", return_value=100
+        ):
+            full_plans, full = count_commits(DeterministicEnergoton(7))
+
+        self.assertEqual(plans, full_plans)
+        self.assertEqual(len(plans), 5)
+        # pairs of the cheap tasks are cut before they're committed
+        self.assertLess(pruned, full)
+
+    def test_build_plans_memo(self):
+        tasks = [Task(1, id_=str(i)) for i in range(3)]
+        pool = Pool(children=tasks)
+
+        e = DeterministicEnergoton(3)
+        e.knapsack_size = 0
+        e.pool = pool
+
+        with mock.patch.object(
+            e, "_commit_plan", wraps=e._commit_plan
+        ) as commit:
+            plans = e.build_plans(pool.dry)
+
+        # all the 6 orders of tasks lead to the same state
+        commit.assert_called_once()
+        self.assertEqual(plans[0].dry, (("0", 1), ("1", 1), ("2", 1)))
+
+        # the states aren't held after the search
+        self.assertFalse(e._committed)
+        self.assertFalse(e._memo)
+
+    def test_build_plans_memo_size(self):
+        tasks = [Task(i % 3 + 1, id_=str(i)) for i in range(6)]
+        pool = Pool(children=tasks)
+
+        e = DeterministicEnergoton(6)
+        e.pool = pool
+        plans = e.build_plans(pool.dry)
+
+        e = DeterministicEnergoton(6, memo_size=2)
+        e.knapsack_size = 0
+        e.pool = pool
+        with mock.patch.object(
+            e._memo, "popitem", wraps=e._memo.popitem
+        ) as popitem:
+            self.assertEqual(e.build_plans(pool.dry), plans)
+
+        popitem.assert_called()
+
+    def test_build_plans_canonical(self):
+        pool = Pool()
+        t1 = Task(5, id_="1")
+        t2 = Task(2, id_="2")
+        t3 = Task(4, id_="3")
+        t4 = Task(2, id_="4")
+        t5 = Task(6, id_="5")
+
+        pool.add(t1)
+        pool.add(t2)
+        pool.add(t3)
+        pool.add(t4)
+        pool.add(t5)
+
+        # the blocked task is cheaper than its blocker
+        Blocking(t5, t3)
+
+        for e in (DeterministicEnergoton(8), NonDeterministicEnergoton(8)):
+            e.pool = pool
+            plans = e.build_plans(pool.dry)
+
+            committed = []
+            commit = e._commit_plan
+
+            def record(*args):
+                committed.append(tuple(sorted(e._path)))
+                commit(*args)
+
+            with mock.patch.object(e, "_commit_plan", side_effect=record):
+                canonical_plans = e.build_plans(pool.dry, canonical=True)
+
+            self.assertEqual(canonical_plans, plans)
+            # every plan is committed only once
+            self.assertEqual(len(committed), len(set(committed)))
+
+    def test_solved_bitmask(self):
+        tasks = [
+            Task(2, id_=str(i), priority=Priority(label))
+            for i, label in enumerate(("low", "normal", "high"))
+        ]
+        pool = Pool(children=tasks)
+
+        e = DeterministicEnergoton(4)
+        e.knapsack_size = 0
+        e.pool = pool
+
+        states = []
+        with mock.patch.object(
+            e, "_commit_plan", side_effect=lambda *_: states.append(e._state())
+        ):
+            e.build_plans(pool.dry)
+
+        # every pair of tasks is committed once
+        self.assertEqual(states, [0b011, 0b101, 0b110])
+
+    def test_state_partial(self):
+        tasks = [
+            Task(cost, id_=str(i), priority=Priority(label))
+            for i, (cost, label) in enumerate(
+                ((2, "low"), (2, "normal"), (3, "high"))
+            )
+        ]
+        pool = Pool(children=tasks)
+
+        e = NonDeterministicEnergoton(4)
+        e.knapsack_size = 0
+        e.pool = pool
+
+        states = []
+        with mock.patch.object(
+            e, "_commit_plan", side_effect=lambda *_: states.append(e._state())
+        ):
+            e.build_plans(pool.dry)
+
+        # the solved tasks, and the task done partially
+        self.assertEqual(
+            states,
+            [
+                0b011,
+                (0b001, (2, 2)),
+                (0b010, (2, 2)),
+                (0b100, (0, 1)),
+                (0b100, (1, 1)),
+            ],
+        )
+
+    def test_build_plans_parallel(self):
+        pool = Pool()
+        t1 = Task(5, id_="1", priority=Priority("high"))
+        t2 = Task(2, id_="2")
+        t3 = Task(4, id_="3")
+        t4 = Task(2, id_="4", priority=Priority("low"))
+        t5 = Task(6, id_="5")
+
+        pool.add(t1)
+        pool.add(t2)
+        pool.add(t3)
+        pool.add(t4)
+        pool.add(t5)
+
+        Blocking(t5, t3)
+        Alternative(t2, t4)
+
+        for e in (DeterministicEnergoton(8), NonDeterministicEnergoton(8)):
+            e.pool = pool
+            plans = e.build_plans(pool.dry)
+
+            for canonical in (False, True):
+                parallel_plans = e.build_plans(
+                    pool.dry, canonical=canonical, workers=2
+                )
+                self.assertEqual(parallel_plans, plans)
+                self.assertEqual(
+                    [[w.amount for w in p] for p in parallel_plans],
+                    [[w.amount for w in p] for p in plans],
+                )
+
+    def test_build_plans_parallel_branches(self):
+        pool = Pool()
+        for i in range(9):
+            pool.add(Task(i % 4 + 2, id_=str(i)))
+
+        Blocking(pool.children["0"], pool.children["5"])
+        Alternative(pool.children["2"], pool.children["7"])
+
+        for e in (DeterministicEnergoton(9), NonDeterministicEnergoton(9)):
+            plans = e.build_plans(pool.dry, max_nodes=10**9)
+            nodes = e._nodes
+
+            # the branches are built one by one in this process
+            shared = multiprocessing.Array("q", energoton._slots)
+            energoton._init_worker(shared)
+            with concurrent.futures.ThreadPoolExecutor(1) as executor:
+                with mock.patch.object(
+                    energoton,
+                    "_worker_pool",
+                    return_value=(executor, shared),
+                ):
+                    parallel_plans = e.build_plans(
+                        pool.dry, workers=2, max_nodes=10**9
+                    )
+
+            self.assertEqual(parallel_plans, plans)
+            # the branches don't search the same states again
+            self.assertLessEqual(energoton._job[1]._nodes, nodes)
+
+    def test_worker_pool(self):
+        executor, shared = energoton._worker_pool(2)
+        self.assertIs(energoton._worker_pool(1)[0], executor)
+        self.assertIs(energoton._worker_pool(2)[1], shared)
+
+        slot = energoton._take_slot(shared)
+        self.assertEqual(shared[slot], -1)
+        energoton._free_slot(slot)
+
+    def test_build_plans_knapsack(self):
+        pool = Pool()
+        for i in range(8):
+            pool.add(Task(i % 4 + 1, id_=str(i)))
+
+        e = DeterministicEnergoton(7)
+        e.pool = pool
+        with mock.patch.object(e, "_build_plans") as build_plans:
+            plans = e.build_plans(pool.dry)
+
+        build_plans.assert_not_called()
+
+        e.knapsack_size = 0
+        searched = e.build_plans(pool.dry)
+
+        self.assertEqual(plans, searched)
+        self.assertEqual(len(plans), 5)
+
+        # relations make the energoton search for the plans
+        Blocking(pool.children["0"], pool.children["1"])
+        e = DeterministicEnergoton(7)
+        e.pool = pool
+        with mock.patch.object(e, "_build_plans") as build_plans:
+            e.build_plans(pool.dry)
+
+        build_plans.assert_called_once()
+
+    def test_build_plans_direct_non_deterministic(self):
+        pool = Pool()
+        for i in range(8):
+            pool.add(
+                Task(
+                    i % 4 + 2,
+                    id_=str(i),
+                    priority=Priority("high" if i % 3 else "normal"),
+                )
+            )
+
+        # the blocker is out of the pool, so the
+        # blocked task can't be worked on at all
+        Blocking(Task(3), pool.children["1"])
+
+        e = NonDeterministicEnergoton(7)
+        e.pool = pool
+        with mock.patch.object(e, "_build_plans") as build_plans:
+            plans = e.build_plans(pool.dry)
+
+        build_plans.assert_not_called()
+        self.assertNotIn("1", [w.task.id for p in plans for w in p])
+
+        e.knapsack_size = 0
+        self.assertEqual(e.build_plans(pool.dry), plans)
+
+    def test_build_plans_budget(self):
+        tasks = [Task(i % 3 + 1, id_=str(i)) for i in range(8)]
+        pool = Pool(children=tasks)
+        Blocking(tasks[0], tasks[1])
+
+        e = DeterministicEnergoton(6)
+        e.pool = pool
+        plans = e.build_plans(pool.dry)
+        self.assertTrue(e.optimal)
+
+        self.assertEqual(e.build_plans(pool.dry, time_limit=60), plans)
+        self.assertTrue(e.optimal)
+
+        limited = e.build_plans(pool.dry, max_nodes=3)
+        self.assertFalse(e.optimal)
+        # the plan being built, when the budget ran out
+        self.assertEqual(len(limited), 1)
+        self.assertLessEqual(limited[0].value, plans[0].value)
+
+        # the plans built without a search are limited as well
+        pool.children["1"].relations.clear()
+        pool.children["0"].relations.clear()
+        self.assertEqual(len(e.build_plans(pool.dry)), 14)
+        self.assertTrue(e.optimal)
+
+        self.assertEqual(len(e.build_plans(pool.dry, max_nodes=2)), 3)
+        self.assertFalse(e.optimal)
+
+    def test_iter_plans(self):
+        tasks = [Task(i % 3 + 1, id_=str(i)) for i in range(6)]
+        pool = Pool(children=tasks)
+        Alternative(tasks[0], tasks[3])
+
+        for e in (DeterministicEnergoton(5), NonDeterministicEnergoton(5)):
+            e.pool = pool
+            dry = pool.dry
+            plans = e.build_plans(dry)
+            self.assertGreater(len(plans), 1)
+
+            self.assertEqual(list(e.iter_plans(dry)), plans)
+
+            # the best value can be found beforehand
+            best = e.best_value(dry)
+            self.assertEqual(best, plans[0].value)
+            self.assertEqual(list(e.iter_plans(dry, best=best)), plans)
+
+            # stopping the iteration takes back the work in progress
+            spent = dry.spent.tobytes()
+            iterator = e.iter_plans(dry)
+            self.assertEqual(next(iterator), plans[0])
+            iterator.close()
+
+            self.assertEqual(dry.spent.tobytes(), spent)
+            self.assertEqual(e.energy_left, 5)
+
+    def test_build_plans_max_plans(self):
+        tasks = [Task(i % 3 + 1, id_=str(i)) for i in range(8)]
+        pool = Pool(children=tasks)
+        Alternative(tasks[0], tasks[3])
+
+        for e in (DeterministicEnergoton(6), NonDeterministicEnergoton(6)):
+            e.pool = pool
+            plans = e.build_plans(pool.dry)
+            self.assertGreater(len(plans), 3)
+
+            self.assertEqual(e.build_plans(pool.dry, max_plans=3), plans[:3])
+            self.assertEqual(
+                e.build_plans(pool.dry, max_plans=3, workers=2), plans[:3]
+            )
+
+            with self.assertRaises(ValueError):
+                e.build_plans(pool.dry, max_plans=0)
+
+        # the plans built without a search are limited as well
+        tasks[0].relations.clear()
+        tasks[3].relations.clear()
+        e = DeterministicEnergoton(6)
+        plans = e.build_plans(pool.dry)
+        self.assertEqual(e.build_plans(pool.dry, max_plans=3), plans[:3])
+
+    def test_build_plans_tolerance(self):
+        tasks = [Task(i % 3 + 1, id_=str(i)) for i in range(6)]
+        pool = Pool(children=tasks)
+
+        e = DeterministicEnergoton(5)
+        e.pool = pool
+        best = e.build_plans(pool.dry)
+
+        plans = e.build_plans(pool.dry, tolerance=4)
+        values = [plan.value for plan in plans]
+        self.assertEqual(values, sorted(values, reverse=True))
+        self.assertEqual(values[0], best[0].value)
+        self.assertGreaterEqual(values[-1], best[0].value - 4)
+        self.assertLess(values[-1], best[0].value)
+        self.assertEqual(plans[: len(best)], best)
+
+        self.assertEqual(
+            e.build_plans(pool.dry, tolerance=4, max_plans=3), plans[:3]
+        )
+
+    def test_build_plans_identical_tasks(self):
+        tasks = [Task(1, id_=str(i)) for i in range(6)]
+        blocker = Task(3, id_="a", priority=Priority("high"))
+        blocked = Task(3, id_="b", priority=Priority("high"))
+        Blocking(blocker, blocked)
+        pool = Pool(children=tasks + [blocker, blocked])
+
+        for e, count in (
+            (DeterministicEnergoton(8), 6),
+            (NonDeterministicEnergoton(8), 16),
+        ):
+            e.pool = pool
+            with mock.patch.object(
+                e, "_commit_plan", wraps=e._commit_plan
+            ) as commit:
+                plans = e.build_plans(pool.dry)
+
+            self.assertEqual(len(plans), count)
+
+            # the identical tasks are chosen, when plans are committed
+            self.assertLess(commit.call_count, count)
+
+            with mock.patch.object(e, "_group_identical"):
+                self.assertEqual(e.build_plans(pool.dry), plans)
+
+            self.assertEqual(e.build_plans(pool.dry, max_plans=4), plans[:4])
+            self.assertEqual(
+                e.build_plans(pool.dry, max_plans=4, workers=2), plans[:4]
+            )
+
+        # relations aren't allocated on the tasks without them
+        self.assertTrue(all(t._relations is None for t in tasks))
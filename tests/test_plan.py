@@ -20,3 +20,19 @@ class TestPlan(unittest.TestCase):
         plan.commit()
 
         self.assertEqual(plan.value, 31)
+
+    def test_spent(self):
+        t1 = Task(5)
+        t2 = Task(3)
+
+        plan = Plan(
+            [
+                WorkDone(t1, 2, mock.Mock(), 1),
+                WorkDone(t2, 3, mock.Mock(), 1),
+                WorkDone(t1, 3, mock.Mock(), 2),
+            ]
+        )
+        plan.commit()
+
+        self.assertEqual(plan.spent, {t1.id: 5, t2.id: 3})
+        self.assertEqual(plan.energy_spent, 8)
@@ -1,9 +1,14 @@
+import concurrent.futures
+import itertools
+import time
 import unittest
 from unittest import mock
 
+from base import Id
 from energoton import DeterministicEnergoton, NonDeterministicEnergoton
+from energoton.energoton import Energoton
 from energoton.planner import Planner, Plan
-from work import Pool, Priority, Task, WorkDone
+from work import Alternative, Blocking, DryPool, Pool, Priority, Task, WorkDone
 
 
 class TestPlanner(unittest.TestCase):
@@ -203,3 +208,413 @@ class TestPlanner(unittest.TestCase):
                 },
             ],
         )
+
+    def test_dry_pool_after_plan(self):
+        t1 = Task(5, id_="1")
+        t2 = Task(2, id_="2")
+        t3 = Task(4, id_="3")
+
+        planner = Planner(Pool(children=[t1, t2, t3]))
+        plans = planner.build_plans([NonDeterministicEnergoton(8)])
+
+        dry = planner.dry_pool_after_plan(plans[0])
+        self.assertIs(dry.base, planner._dry_pool)
+        self.assertEqual(
+            {dry.ids[i]: dry.spent[i] for i in range(len(dry))},
+            {"1": 2, "2": 2, "3": 4},
+        )
+        self.assertEqual(list(planner._dry_pool.spent), [0, 0, 0])
+
+    def test_pool_after_plan_shares_tasks(self):
+        t1 = Task(5, id_="1")
+        t2 = Task(3, id_="2")
+        t3 = Task(9, id_="3")
+        pool = Pool(children=[t1, t2, t3])
+
+        planner = Planner(pool)
+        plans = planner.build_plans([DeterministicEnergoton(8)])
+
+        result_pool = planner.pool_after_plan(plans[0])
+        self.assertTrue(result_pool.get(t1.id).is_solved)
+        self.assertTrue(result_pool.get(t2.id).is_solved)
+        self.assertIs(result_pool.get(t3.id), t3)
+
+        self.assertFalse(t1.is_solved)
+        self.assertFalse(planner._pool.get(t1.id).is_solved)
+
+    def test_pool_changed_after_planner(self):
+        t1 = Task(5, id_="a")
+        t2 = Task(3, id_="b")
+        pool = Pool(children=[t1, t2])
+
+        planner = Planner(pool)
+        after = planner.pool_after_plan(planner._empty_plan())
+        t2.work_done.append(WorkDone(t2, 3, mock.Mock()))
+
+        self.assertTrue(pool.get("b").is_solved)
+        for snapshot in (planner._pool, after):
+            self.assertFalse(snapshot.get("b").is_solved)
+            self.assertFalse(snapshot.is_solved)
+            self.assertEqual(snapshot.dry.ids, ["b", "a"])
+
+    def test_build_plans_executor(self):
+        pool = Pool()
+        for i in range(6):
+            pool.add(Task(i % 3 + 2, id_=str(i)))
+
+        energotons = [
+            DeterministicEnergoton(5, id_="1"),
+            NonDeterministicEnergoton(4, id_="2"),
+        ]
+        plans = Planner(pool).build_plans(energotons, cycles=2)
+
+        for executor in (
+            concurrent.futures.ThreadPoolExecutor(2),
+            concurrent.futures.ProcessPoolExecutor(2),
+        ):
+            with executor:
+                planner = Planner(pool)
+                self.assertEqual(
+                    planner.build_plans(
+                        energotons, cycles=2, executor=executor
+                    ),
+                    plans,
+                )
+
+            # the plans are built of the planner's own tasks
+            for plan in planner._plans:
+                for w in plan:
+                    self.assertIs(
+                        w.task,
+                        planner._dry_pool.tasks[
+                            planner._dry_pool.index[w.task.id]
+                        ],
+                    )
+
+    def test_build_plans_budget(self):
+        pool = Pool()
+        for i in range(8):
+            pool.add(Task(i % 3 + 1, id_=str(i)))
+
+        Blocking(pool.children["0"], pool.children["1"])
+
+        planner = Planner(pool)
+        plans = planner.build_plans([NonDeterministicEnergoton(6)])
+        self.assertTrue(planner.optimal)
+
+        limited = planner.build_plans(
+            [DeterministicEnergoton(6, id_="1")] * 2, max_nodes=1
+        )
+        self.assertFalse(planner.optimal)
+        self.assertLessEqual(limited[0].value, plans[0].value)
+
+    def test_build_plans_budget_identical_tasks(self):
+        tasks = [Task(i % 3 + 1, id_=str(i)) for i in range(300)]
+        for i in range(5):
+            Blocking(tasks[i], tasks[i + 100])
+
+        planner = Planner(Pool(children=tasks))
+
+        # every reading of the clock is a second later,
+        # so the time runs out on the first check
+        clock = itertools.count()
+        with mock.patch.object(
+            time, "monotonic", side_effect=clock.__next__
+        ), mock.patch.object(
+            Energoton,
+            "_out_of_budget",
+            autospec=True,
+            side_effect=Energoton._out_of_budget,
+        ) as nodes, mock.patch.object(
+            Energoton,
+            "_make_plan",
+            autospec=True,
+            side_effect=Energoton._make_plan,
+        ) as made:
+            plans = planner.build_plans(
+                [NonDeterministicEnergoton(16)], time_limit=0.2
+            )
+
+        # choices out of the classes of identical tasks are
+        # counted against the budget, which is checked on
+        # every 256 nodes
+        self.assertFalse(planner.optimal)
+        self.assertTrue(plans)
+        self.assertLess(nodes.call_count, 2 * 256)
+        self.assertLessEqual(made.call_count, nodes.call_count)
+
+    def test_iter_plans(self):
+        pool = Pool()
+        for i in range(6):
+            pool.add(Task(i % 3 + 2, id_=str(i)))
+
+        Blocking(pool.children["0"], pool.children["1"])
+
+        energotons = [
+            DeterministicEnergoton(5, id_="1"),
+            NonDeterministicEnergoton(4, id_="2"),
+        ]
+        plans = Planner(pool).build_plans(energotons, cycles=2)
+
+        self.assertEqual(
+            tuple(Planner(pool).iter_plans(energotons, cycles=2)), plans
+        )
+
+    def test_iter_plans_single_search(self):
+        pool = Pool()
+        for i in range(6):
+            pool.add(Task(i % 3 + 2, id_=str(i)))
+
+        energotons = [
+            DeterministicEnergoton(5, id_="1"),
+            DeterministicEnergoton(4, id_="2"),
+        ]
+        plans = Planner(pool).build_plans(energotons)
+
+        with mock.patch.object(
+            Energoton, "_direct_paths", return_value=None
+        ), mock.patch.object(
+            Energoton,
+            "_search_best",
+            autospec=True,
+            side_effect=Energoton._search_best,
+        ) as search, mock.patch.object(
+            Energoton,
+            "best_value",
+            autospec=True,
+            side_effect=Energoton.best_value,
+        ) as best_value:
+            self.assertEqual(
+                tuple(Planner(pool).iter_plans(energotons)), plans
+            )
+
+        # the best value is searched for once per plan continued,
+        # and the plans are yielded without searching for it again
+        self.assertGreater(best_value.call_count, 1)
+        self.assertEqual(search.call_count, best_value.call_count)
+
+    def test_build_plans_max_plans(self):
+        pool = Pool()
+        for i in range(6):
+            pool.add(Task(i % 3 + 2, id_=str(i)))
+
+        Blocking(pool.children["0"], pool.children["1"])
+
+        energotons = [
+            DeterministicEnergoton(5, id_="1"),
+            NonDeterministicEnergoton(4, id_="2"),
+        ]
+        plans = Planner(pool).build_plans(energotons)
+        self.assertGreater(len(plans), 2)
+
+        limited = Planner(pool).build_plans(energotons, max_plans=2)
+        self.assertEqual(limited, plans[:2])
+
+        tolerant = Planner(pool).build_plans(energotons, tolerance=4)
+        self.assertGreater(len(tolerant), len(plans))
+        self.assertEqual(tolerant[: len(plans)], plans)
+
+    def test_build_plans_max_plans_beam(self):
+        pool = Pool(
+            children=[
+                Task(2, id_="1", priority=Priority("high")),
+                Task(1, id_="2", priority=Priority("lowest")),
+                Task(5, id_="3", priority=Priority("lowest")),
+                Task(3, id_="4", priority=Priority("highest")),
+            ]
+        )
+        energotons = [
+            NonDeterministicEnergoton(3, id_="1"),
+            NonDeterministicEnergoton(3, id_="2"),
+        ]
+
+        planner = Planner(pool)
+        best = planner.build_plans(energotons, cycles=2)
+        self.assertTrue(planner.optimal)
+
+        # the plan continued to the best one is dropped on a step
+        limited = planner.build_plans(energotons, cycles=2, max_plans=1)
+        self.assertLess(limited[0].value, best[0].value)
+        self.assertFalse(planner.optimal)
+
+        # plans dropped on the last step are just not returned
+        last = planner.build_plans(energotons[:1], max_plans=1)
+        self.assertEqual(len(last), 1)
+        self.assertTrue(planner.optimal)
+
+    def test_plan_hash(self):
+        t1 = Task(5, id_="1")
+        t2 = Task(2, id_="2")
+        e = DeterministicEnergoton(8)
+
+        p1 = Plan([WorkDone(t1, 5, e), WorkDone(t2, 2, e)])
+        p1.commit()
+        p2 = Plan().extended([WorkDone(t2, 2, e), WorkDone(t1, 5, e)])
+        p3 = Plan([WorkDone(t1, 4, e)])
+        p3.commit()
+
+        self.assertEqual(p1, p2)
+        self.assertEqual(hash(p1), hash(p2))
+        self.assertEqual(len({p1, p2, p3}), 2)
+
+    def test_build_plans_break_symmetry(self):
+        pool = Pool()
+        for i in range(8):
+            pool.add(Task(2, id_=str(i)))
+
+        Blocking(pool.children["0"], pool.children["1"])
+
+        energotons = [DeterministicEnergoton(4, id_=str(i)) for i in range(3)]
+        with mock.patch.object(
+            Plan, "extended", autospec=True, side_effect=Plan.extended
+        ) as extended:
+            plans = Planner(pool).build_plans(energotons)
+            built = extended.call_count
+
+            extended.reset_mock()
+            symmetric = Planner(pool).build_plans(
+                energotons, break_symmetry=True
+            )
+            # the plans differing by assignees only aren't built
+            self.assertLess(extended.call_count, built)
+
+        self.assertEqual(set(symmetric), set(plans))
+
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            symmetric = Planner(pool).build_plans(
+                energotons, break_symmetry=True, executor=executor
+            )
+        self.assertEqual(set(symmetric), set(plans))
+
+    def test_break_symmetry_in_search(self):
+        tasks = [
+            Task(cost, id_=str(i)) for i, cost in enumerate([3, 4, 2, 4, 3, 3])
+        ]
+        Alternative(tasks[4], tasks[0])
+        pool = Pool(children=tasks)
+
+        energotons = [DeterministicEnergoton(4, id_=str(i)) for i in range(3)]
+        with mock.patch.object(
+            Energoton,
+            "_build_plans",
+            autospec=True,
+            side_effect=Energoton._build_plans,
+        ) as nodes:
+            plans = Planner(pool).build_plans(energotons)
+            searched = nodes.call_count
+
+            nodes.reset_mock()
+            symmetric = Planner(pool).build_plans(
+                energotons, break_symmetry=True
+            )
+            # the branches taking the work going before the work
+            # of the previous energoton aren't searched through
+            self.assertLess(nodes.call_count, searched)
+
+        self.assertEqual(set(symmetric), set(plans))
+
+    def test_blocking_loop(self):
+        pool = Pool()
+        t1 = Task(1, id_=1)
+        t2 = Task(1, id_=2)
+        t3 = Task(1, id_=3)
+        pool.add(t1)
+        pool.add(t2)
+        pool.add(t3)
+
+        Blocking(t1, t2)
+        Blocking(t2, t3)
+        Blocking(t3, t1)
+
+        with self.assertRaises(ValueError):
+            Planner(pool)
+
+    def test_unreachable_tasks(self):
+        pool = Pool()
+        t1 = Task(5, id_=1)
+        t2 = Task(2, id_=2)
+        t3 = Task(1, id_=3, priority=Priority("high"))
+        t4 = Task(1, id_=4)
+        pool.add(t1)
+        pool.add(t2)
+        pool.add(t3)
+        pool.add(t4)
+
+        Blocking(t1, t2)
+        Blocking(t2, t3)
+        Blocking(Task(1), t4)
+
+        planner = Planner(pool)
+        plans = planner.build_plans([DeterministicEnergoton(6)])
+        # all the energy goes to the
+        # blockers of t3, t4 is blocked
+        self.assertEqual(set(planner._dry_pool.ids), {1, 2})
+
+        self.assertEqual(len(plans), 1)
+        self.assertEqual([(w.task.id, w.amount) for w in plans[0]], [(1, 5)])
+
+        planner = Planner(pool)
+        planner.build_plans([DeterministicEnergoton(4)], cycles=2)
+        self.assertEqual(set(planner._dry_pool.ids), {1, 2, 3})
+
+    def test_order_blocking_large_pool(self):
+        tasks = [Task(i % 9 + 1, id_=str(i)) for i in range(4000)]
+        pool = Pool(children=tasks)
+        for blocker, blocked in zip(tasks, tasks[1:]):
+            Blocking(blocker, blocked)
+
+        planner = Planner(pool)
+        for energy in (10, 10**9):
+            with mock.patch.object(
+                DryPool, "todo", autospec=True, side_effect=DryPool.todo
+            ) as todo:
+                unblockable = planner._unblockable(energy)
+
+            # every blocking is accounted once
+            self.assertEqual(todo.call_count, len(tasks) - 1)
+            self.assertEqual(
+                unblockable.count(True), 4000 if energy > 10 else 4
+            )
+
+    def test_unblockable_shared_blockers(self):
+        t1 = Task(3, id_="1")
+        t2 = Task(1, id_="2")
+        t3 = Task(1, id_="3")
+        t4 = Task(1, id_="4")
+        t5 = Task(1, id_="5")
+        pool = Pool(children=[t1, t2, t3, t4, t5])
+
+        Blocking(t1, t2)
+        Blocking(t1, t3)
+        Blocking(t2, t4)
+        Blocking(t3, t4)
+        Blocking(Task(1), t5)
+
+        planner = Planner(pool)
+        ids = planner._whole_dry_pool.ids
+        # t1 is counted once for t4
+        self.assertEqual(
+            dict(zip(ids, planner._unblockable(6))),
+            {"1": True, "2": True, "3": True, "4": True, "5": False},
+        )
+        self.assertEqual(
+            dict(zip(ids, planner._unblockable(5))),
+            {"1": True, "2": True, "3": True, "4": False, "5": False},
+        )
+
+    def test_mixed_ids(self):
+        t1 = Task(2)
+        Id.use_int_ids()
+        try:
+            t2 = Task(3)
+        finally:
+            Id.use_int_ids(False)
+
+        planner = Planner(Pool(children=[t1, t2]))
+        plans = planner.build_plans([NonDeterministicEnergoton(5)])
+
+        self.assertEqual(len(plans), 1)
+        self.assertEqual(
+            sorted(w.amount for w in plans[0]),
+            [2, 3],
+        )
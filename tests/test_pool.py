@@ -1,7 +1,8 @@
+import pickle
 import unittest
 from unittest import mock
 
-from work import Pool, Task, WorkDone
+from work import Alternative, Blocking, Pool, Priority, Task, WorkDone
 
 
 class TestPool(unittest.TestCase):
@@ -71,6 +72,23 @@ class TestPool(unittest.TestCase):
         self.assertEqual(len(root_pool), 1)
         self.assertEqual(len(pool), 0)
 
+    def test_pop_nested(self):
+        task1 = Task(10, id_="1", name="Task 1")
+        task2 = Task(20, id_="2", name="Task 2")
+        pool = Pool(children=[task1, task2], name="Pool 1")
+        middle_pool = Pool(children=[pool], name="Middle Pool")
+        root_pool = Pool(children=[middle_pool], name="Root Pool")
+
+        root_pool.pop(task1.id)
+        self.assertNotIn(task1.id, middle_pool.children)
+        self.assertEqual(list(pool), [task2])
+
+        middle_pool.pop(pool.id)
+        self.assertEqual(len(root_pool), 1)
+        self.assertEqual(list(middle_pool), [])
+        self.assertTrue(root_pool.is_solved)
+        self.assertEqual(list(pool), [task2])
+
     def test_iter(self):
         tasks = [Task(i, id_=i) for i in range(5)]
         pool = Pool(children=tasks, name="Pool 1")
@@ -91,6 +109,186 @@ class TestPool(unittest.TestCase):
 
         self.assertTrue(pool.is_solved)
 
+    def test_todo_cost(self):
+        task1 = Task(10, name="Task 1")
+        task2 = Task(20, name="Task 2")
+        pool = Pool(children=[task1], name="Pool 1")
+        root_pool = Pool(children=[pool], name="Root Pool")
+
+        self.assertEqual(root_pool.todo_cost, 10)
+
+        # the task is indexed by all the pools above
+        pool.add(task2)
+        self.assertIs(root_pool.get(task2.id), task2)
+        self.assertEqual(root_pool.todo_cost, 30)
+
+        task2.work_done.append(WorkDone(task2, 5, mock.Mock()))
+        self.assertEqual(pool.todo_cost, 25)
+        self.assertEqual(root_pool.todo_cost, 25)
+
+        task2.cost = 5
+        self.assertEqual(root_pool.todo_cost, 10)
+
+        task1.work_done.append(WorkDone(task1, 10, mock.Mock()))
+        self.assertTrue(root_pool.is_solved)
+        self.assertEqual(root_pool.todo_cost, 0)
+
+        task1.work_done.pop()
+        self.assertFalse(root_pool.is_solved)
+
+        pool.pop(task1.id)
+        self.assertTrue(pool.is_solved)
+        self.assertEqual(pool.todo_cost, 0)
+
+    def test_children_of_other_pools(self):
+        task1 = Task(10, name="Task 1")
+        task2 = Task(20, name="Task 2")
+        pool = Pool(children=[task1, task2], name="Pool 1")
+
+        # the view indexes the tasks, which stay in their pool
+        view = Pool(children=[task2], name="View")
+        root_pool = Pool(children=[view], name="Root Pool")
+        self.assertIs(task2.parent, pool)
+        self.assertEqual(list(view), [])
+        self.assertEqual(root_pool.todo_cost, 20)
+
+        task2.work_done.append(WorkDone(task2, 5, mock.Mock()))
+        self.assertEqual(view.todo_cost, 15)
+        self.assertEqual(root_pool.todo_cost, 15)
+        self.assertEqual(view.dry.spent[0], 5)
+
+        task2.cost = 5
+        self.assertTrue(view.is_solved)
+        self.assertEqual(len(root_pool.dry), 0)
+
+        view.pop(task2.id)
+        task2.cost = 8
+        self.assertTrue(view.is_solved)
+        self.assertEqual(root_pool.todo_cost, 0)
+
+    def test_views_released(self):
+        task = Task(10)
+        pool = Pool(children=[task])
+
+        for _ in range(10):
+            Pool(children=[task]).dry
+
+        # the views aren't referenced, so the task doesn't keep them
+        self.assertEqual(len(task._watchers), 0)
+
+        view = Pool(children=[task])
+        task.work_done.append(WorkDone(task, 5, mock.Mock()))
+        self.assertEqual(list(task._watchers.values()), [view])
+        self.assertEqual(view.todo_cost, 5)
+        self.assertEqual(pool.todo_cost, 5)
+
+    def test_dry(self):
+        task1 = Task(10, id_="1", name="Task 1")
+        task2 = Task(20, id_="2", name="Task 2")
+        task3 = Task(5, id_="3", name="Task 3")
+        pool = Pool(children=[task1, task2], name="Pool 1")
+        # the queue of the tasks is built on demand
+        self.assertIsNone(pool._queued)
+
+        dry = pool.dry
+        self.assertEqual(dry.ids, ["1", "2"])
+
+        # the changes are spliced into the dry view
+        with mock.patch("work.pool.DryPool") as build:
+            pool.add(task3)
+            self.assertEqual(pool.dry.ids, ["3", "1", "2"])
+
+            task2.cost = 1
+            self.assertEqual(pool.dry.ids, ["2", "3", "1"])
+
+            task2.cost = 20
+            self.assertEqual(pool.dry.ids, ["3", "1", "2"])
+
+        build.assert_not_called()
+
+        task1.work_done.append(WorkDone(task1, 4, mock.Mock()))
+        self.assertEqual(list(pool.dry.spent), [0, 4, 0])
+        # the views returned before aren't changed
+        self.assertEqual(list(dry.spent), [0, 0])
+
+        task2.cost = 1
+        self.assertEqual(pool.dry.ids, ["2", "3", "1"])
+
+        task3.work_done.append(WorkDone(task3, 5, mock.Mock()))
+        self.assertEqual(pool.dry.ids, ["2", "1"])
+
+        task3.work_done = []
+        self.assertEqual(pool.dry.ids, ["2", "3", "1"])
+
+        pool.pop(task1.id)
+        self.assertEqual(pool.dry.ids, ["2", "3"])
+
+        Blocking(task2, task3)
+        self.assertEqual(pool.dry.blockers, [0, 0b1])
+
+        task3.relations.clear()
+        self.assertEqual(pool.dry.blockers, [0, 0])
+
+    def test_dry_relations_scope(self):
+        task1 = Task(10, id_="1")
+        task2 = Task(20, id_="2")
+        task3 = Task(5, id_="3")
+        task4 = Task(7, id_="4")
+        pool1 = Pool(children=[task1, task2])
+        pool2 = Pool(children=[task3, task4])
+        root = Pool(children=[pool2])
+
+        views = (pool1.dry, pool2.dry, root.dry)
+        cached = pool1._dry
+
+        # the views indexing the changed tasks are updated in place
+        with mock.patch("work.pool.DryPool") as build:
+            Blocking(task3, task4)
+            task4.priority = Priority("high")
+            Task(1).priority = Priority("low")
+
+            for pool in (pool2, root):
+                self.assertEqual(pool.dry.blockers, [0, 0b1])
+                self.assertEqual(
+                    list(pool.dry.value),
+                    [Priority("normal").value, Priority("high").value],
+                )
+
+        build.assert_not_called()
+        self.assertIs(pool1._dry, cached)
+
+        # the views returned before aren't changed
+        self.assertEqual(views[1].blockers, [0, 0])
+        self.assertEqual(list(views[2].value), list(views[0].value))
+
+    def test_is_blocked_by_ancestor(self):
+        task = Task(1)
+        inner = Pool(children=[task])
+        outer = Pool(children=[inner])
+        blocker = Task(1)
+
+        self.assertFalse(task.is_blocked)
+        self.assertIs(task._chain_blocked, False)
+
+        # the states cached below the blocked pool are dropped
+        rel = Blocking(blocker, outer)
+        self.assertTrue(task.is_blocked)
+
+        blocker.work_done.append(WorkDone(blocker, 1, mock.Mock()))
+        self.assertFalse(task.is_blocked)
+
+        blocker.work_done.clear()
+        self.assertTrue(task.is_blocked)
+
+        outer.pop(inner.id)
+        self.assertFalse(task.is_blocked)
+
+        outer.add(inner)
+        self.assertTrue(task.is_blocked)
+
+        rel.drop()
+        self.assertFalse(task.is_blocked)
+
     def test_done(self):
         task1 = Task(10, name="Task 1")
         task1.work_done.append(WorkDone(task1, task1.cost, mock.Mock()))
@@ -152,3 +350,87 @@ class TestPool(unittest.TestCase):
 
         root_pool = Pool(children=[pool1, task3], name="Root Pool")
         self.assertEqual(list(root_pool), [pool1, task3])
+
+    def test_snapshot(self):
+        task1 = Task(10, name="Task 1")
+        task2 = Task(20, name="Task 2")
+        pool1 = Pool(children=[task1, task2], name="Pool 1")
+
+        task3 = Task(30, name="Task 3")
+        root_pool = Pool(children=[pool1, task3], name="Root Pool")
+
+        snapshot = root_pool.snapshot()
+
+        # pools are copied, tasks are shared
+        self.assertIsNot(snapshot, root_pool)
+        self.assertIsNot(snapshot.get(pool1.id), pool1)
+        self.assertIs(snapshot.get(pool1.id).parent, snapshot)
+        self.assertIs(snapshot.get(task1.id), task1)
+        self.assertEqual(list(snapshot), [pool1, task3])
+
+        snapshot.record(WorkDone(task1, 10, mock.Mock()))
+
+        # the task is cloned on write
+        clone = snapshot.get(task1.id)
+        self.assertIsNot(clone, task1)
+        self.assertIs(snapshot.get(pool1.id).get(task1.id), clone)
+        self.assertIs(clone.parent, snapshot.get(pool1.id))
+        self.assertTrue(clone.is_solved)
+        self.assertIs(snapshot.get(task2.id), task2)
+
+        self.assertFalse(task1.is_solved)
+        self.assertIs(root_pool.get(task1.id), task1)
+        self.assertIs(pool1.get(task1.id), task1)
+
+    def test_snapshot_original_changes(self):
+        task1 = Task(10, name="Task 1")
+        task2 = Task(20, name="Task 2")
+        pool1 = Pool(children=[task1, task2], name="Pool 1")
+        root_pool = Pool(children=[pool1], name="Root Pool")
+
+        snapshot = root_pool.snapshot()
+        nested = snapshot.snapshot()
+
+        # the shared task is cloned before the original changes
+        task1.work_done.append(WorkDone(task1, 10, mock.Mock()))
+        for pool in (snapshot, nested):
+            clone = pool.get(task1.id)
+            self.assertIsNot(clone, task1)
+            self.assertFalse(clone.is_solved)
+            self.assertFalse(pool.is_solved)
+            self.assertEqual(pool.todo_cost, 30)
+            self.assertEqual(pool.dry.ids, [task1.id, task2.id])
+            self.assertIs(pool.dry.tasks[0], clone)
+
+        task2.cost = 5
+        root_pool.pop(pool1.id)
+        task2.work_done.append(WorkDone(task2, 5, mock.Mock()))
+        self.assertEqual(snapshot.get(task2.id).cost, 20)
+        self.assertEqual(snapshot.todo_cost, 30)
+        self.assertEqual(nested.get(pool1.id).todo_cost, 30)
+        self.assertEqual(nested.get(task2.id).cost, 20)
+
+        pickled = pickle.loads(pickle.dumps(root_pool))
+        self.assertEqual(len(pickled._snapshots), 0)
+
+    def test_snapshot_relations(self):
+        task1 = Task(10, name="Task 1")
+        task2 = Task(20, name="Task 2")
+        task3 = Task(30, name="Task 3")
+        pool = Pool(children=[task1, task2, task3], name="Pool 1")
+
+        Blocking(task1, task2)
+        Alternative(task2, task3)
+
+        snapshot = pool.snapshot()
+        snapshot.record(WorkDone(task1, 10, mock.Mock()))
+
+        clone2 = snapshot.get(task2.id)
+        clone3 = snapshot.get(task3.id)
+        self.assertIsNot(clone2, task2)
+        self.assertFalse(clone2.is_blocked)
+        self.assertTrue(task2.is_blocked)
+
+        snapshot.record(WorkDone(task3, 30, mock.Mock()))
+        self.assertFalse(clone2.is_actual)
+        self.assertTrue(task2.is_actual)
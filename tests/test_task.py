@@ -1,7 +1,8 @@
+import pickle
 import unittest
 from unittest import mock
 
-from work import Alternative, Task, WorkDone
+from work import Alternative, Pool, Priority, Task, WorkDone
 from work.relation import Alternative, Blocking
 
 
@@ -52,6 +53,20 @@ class TestTask(unittest.TestCase):
         self.assertEqual(work_done.task.todo, 3)
         self.assertEqual(work_done.task.name, "Task 1")
 
+    def test_cost_change(self):
+        task = Task(8, name="Task 1")
+        task.work_done.append(WorkDone(task, 5, mock.Mock()))
+        task.work_done.extend([WorkDone(task, 1, mock.Mock())])
+        self.assertEqual(task.spent, 6)
+
+        task.cost = 6
+        self.assertTrue(task.is_solved)
+        self.assertEqual(task.todo, 0)
+
+        del task.work_done[0]
+        self.assertEqual(task.spent, 1)
+        self.assertEqual(task.todo, 5)
+
     def test_custom_fields(self):
         key1 = "key1"
         value1 = "value1"
@@ -114,6 +129,48 @@ class TestTask(unittest.TestCase):
         self.assertEqual(list(blocked.blocked_by), [])
         self.assertFalse(blocked.is_blocked)
 
+    def test_is_blocked_cache(self):
+        blocker = Task(cost=3, name="test-name1")
+        blocked = Task(cost=3, name="test-name2")
+        pool = Pool(children=[blocked])
+
+        Blocking(blocker, pool)
+        self.assertTrue(blocked.is_blocked)
+        self.assertTrue(blocked.is_blocked)
+
+        pool.pop(blocked.id)
+        self.assertFalse(blocked.is_blocked)
+
+        pool.add(blocked)
+        self.assertTrue(blocked.is_blocked)
+
+        blocker.work_done.append(WorkDone(blocker, 3, mock.Mock()))
+        self.assertFalse(blocked.is_blocked)
+
+        blocker.work_done.pop()
+        self.assertTrue(blocked.is_blocked)
+
+    def test_is_blocked_cache_scope(self):
+        blocker = Task(cost=3, name="test-name1")
+        blocked = Task(cost=3, name="test-name2")
+        other = Task(cost=3, name="test-name3")
+        Pool(children=[blocked, other])
+
+        Blocking(blocker, blocked)
+        self.assertTrue(blocked.is_blocked)
+
+        # changes of unrelated units keep the cached state
+        Task(cost=1, parent=blocked.parent)
+        other.work_done.append(WorkDone(other, 3, mock.Mock()))
+        self.assertTrue(blocked._blocked)
+
+        blocker.work_done.append(WorkDone(blocker, 1, mock.Mock()))
+        self.assertTrue(blocked._blocked)
+
+        blocker.work_done.append(WorkDone(blocker, 2, mock.Mock()))
+        self.assertIsNone(blocked._blocked)
+        self.assertFalse(blocked.is_blocked)
+
     def test_alternative_relationship(self):
         alt1 = Task(cost=3, name="test-name1")
         alt2 = Task(cost=3, name="test-name2")
@@ -125,6 +182,24 @@ class TestTask(unittest.TestCase):
         self.assertEqual(list(alt2.relations.values())[0], rel)
         self.assertEqual(list(alt3.relations.values())[0], rel)
 
+    def test_compact(self):
+        task = Task(3, priority=Priority("high"))
+        self.assertFalse(hasattr(task, "__dict__"))
+        self.assertIs(task.priority, Priority("high"))
+
+        clone = pickle.loads(pickle.dumps(task))
+        self.assertIs(clone.priority, task.priority)
+        self.assertEqual(clone.custom_fields, {})
+
+        task["key"] = "value"
+        self.assertEqual(task["key"], "value")
+
+        # a new task has nothing to recount
+        with mock.patch.object(Task, "_recount") as recount:
+            Task(3)
+
+        recount.assert_not_called()
+
 
 class TestPartTask(unittest.TestCase):
     def test_part(self):
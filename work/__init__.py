@@ -1,3 +1,4 @@
+from .dry_pool import DryPool
 from .pool import Pool
 from .relation import Alternative, Blocking
 from .task import Task
@@ -0,0 +1,363 @@
+"""Short form of a pool, used during plan building."""
+
+import array
+import weakref
+
+from .relation import Blocking
+
+
+class DryPool:
+    """Array-backed short form of a pool of tasks.
+
+    Tasks are addressed by integer indices. Costs, amounts
+    of energy spent and priority values of the tasks are
+    kept in parallel arrays, so that plan building works
+    on ints instead of per-task dicts. Relations between
+    the tasks are indexed as bitmasks of the indices.
+
+    The index of the task ids is built on demand, and built
+    anew after tasks are inserted or removed.
+
+    Args:
+        tasks (Iterable[work.task.Task]):
+            Tasks to be solved.
+    """
+
+    def __init__(self, tasks=()):
+        self.tasks = list(tasks)
+        self.ids = [t.id for t in self.tasks]
+        self.index = {id_: i for i, id_ in enumerate(self.ids)}
+        # copies and overlays sharing the containers of the pool
+        self._views = weakref.WeakSet()
+
+        self.cost = array.array("q", (t.cost for t in self.tasks))
+        self.spent = array.array("q", (t.spent for t in self.tasks))
+        self.value = array.array("q", (t.priority.value for t in self.tasks))
+
+        self._index_relations()
+
+    def _index_relations(self):
+        """Index the relations of the tasks.
+
+        For every task, the index keeps bitmasks of its
+        blockers, of its alternatives (including the task
+        itself) and of all the tasks related to it. Units
+        out of the pool are kept as they are.
+        """
+        self.blockers = [0] * len(self.tasks)
+        self.alternatives = [0] * len(self.tasks)
+        self.related = [0] * len(self.tasks)
+        # indices of the tasks with units out of the pool:
+        # the blockers and the alternatives of every task
+        self.outer = {}
+        # indices of the tasks with non-zero masks
+        self._linked = set()
+
+        for ind, task in enumerate(self.tasks):
+            if task._relations:
+                self._index_task(ind)
+
+    def _index_task(self, ind):
+        """Index the relations of a single task.
+
+        The masks and the units out of the pool are set
+        anew, in the containers of the pool.
+
+        Args:
+            ind (int): Index of the task.
+        """
+        task = self.tasks[ind]
+        masks = [0, 0]
+        related = 0
+        outer = ([], [])
+
+        for rel in task._related:
+            for unit in rel.units:
+                other = self.index.get(unit.id)
+                if other is not None and other != ind:
+                    related |= 1 << other
+
+            if isinstance(rel, Blocking):
+                if rel.blocked.id != task.id:
+                    continue
+
+                units, kind = (rel.blocker,), 0
+            else:
+                units, kind = rel.alternatives, 1
+
+            for unit in units:
+                other = self.index.get(unit.id)
+                if other is not None:
+                    masks[kind] |= 1 << other
+                elif not any(unit is u for u in outer[kind]):
+                    # the same as the masks, every unit is kept once
+                    outer[kind].append(unit)
+
+        self.blockers[ind], self.alternatives[ind] = masks
+        self.related[ind] = related
+        if masks[0] or masks[1] or related:
+            self._linked.add(ind)
+        else:
+            self._linked.discard(ind)
+
+        if outer[0] or outer[1]:
+            self.outer[ind] = outer
+        else:
+            self.outer.pop(ind, None)
+
+    def __len__(self):
+        """Magic method for the len() function.
+
+        Returns:
+            int: Number of tasks in the pool.
+        """
+        return len(self.tasks)
+
+    def __repr__(self):
+        """Textual representation of the dry pool.
+
+        Returns:
+            str: Textual representation.
+        """
+        return f"DryPool(tasks={len(self)})"
+
+    def copy(self):
+        """Copy the pool to change spent amounts independently.
+
+        The tasks, their ids, costs and values are shared
+        with the copy, only the spent amounts are copied.
+
+        Returns:
+            DryPool: The copy of the pool.
+        """
+        pool = DryPool.__new__(DryPool)
+        pool.__dict__.update(self.__dict__)
+        pool.spent = array.array("q", self.spent)
+
+        self._views.add(self)
+        self._views.add(pool)
+        return pool
+
+    def overlay(self, spent):
+        """Overlay amounts of energy spent in a plan over the pool.
+
+        The overlay shares the pool and keeps only the given
+        amounts. Its spent array is built on the first access.
+
+        Args:
+            spent (Dict[Any, int]):
+                Energy spent on tasks, by task ids.
+
+        Returns:
+            DryPool: The overlay.
+        """
+        pool = DryPool.__new__(DryPool)
+        pool.__dict__.update(self.__dict__)
+        pool.__dict__.pop("spent", None)
+
+        pool.base = self
+        pool.diff = spent
+
+        self._views.add(self)
+        self._views.add(pool)
+        return pool
+
+    def __getattr__(self, name):
+        """Build the index of the ids, or the spent array of an overlay.
+
+        Args:
+            name (str): Attribute name.
+
+        Returns:
+            Union[Dict[Any, int], array.array]:
+                Indices of the tasks by their ids,
+                or energy spent on every task.
+        """
+        if name == "index" and "ids" in self.__dict__:
+            self.index = {id_: i for i, id_ in enumerate(self.ids)}
+            return self.index
+
+        if name != "spent" or "diff" not in self.__dict__:
+            raise AttributeError(name)
+
+        self.spent = array.array("q", self.base.spent)
+        for id_, amount in self.diff.items():
+            self.spent[self.index[id_]] += amount
+
+        return self.spent
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_views"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._views = weakref.WeakSet()
+
+    def _unshare(self):
+        """Copy the containers shared with alive copies or overlays.
+
+        The pool is changed in place then, and the copies
+        and overlays made before aren't changed. The index
+        isn't changed in place, so it's kept shared.
+        """
+        views = self._views
+        if len(views) == (self in views):
+            return
+
+        views.discard(self)
+        self._views = weakref.WeakSet()
+
+        self.tasks = list(self.tasks)
+        self.ids = list(self.ids)
+        for name in ("cost", "spent", "value"):
+            setattr(self, name, array.array("q", getattr(self, name)))
+
+        self.blockers = list(self.blockers)
+        self.alternatives = list(self.alternatives)
+        self.related = list(self.related)
+        self.outer = dict(self.outer)
+        self._linked = set(self._linked)
+
+    def remove(self, ind):
+        """Remove a task from the pool.
+
+        Relations of the other tasks with the removed one
+        move out of the pool. Only the masks of the related
+        tasks are shifted, and the index is built anew on
+        the next access.
+
+        Args:
+            ind (int): Index of the task.
+        """
+        self._unshare()
+        task = self.tasks[ind]
+
+        related = self.related[ind]
+        while related:
+            other = (related & -related).bit_length() - 1
+            related &= related - 1
+
+            blockers, alternatives = self.outer.get(other, ([], []))
+            if self.blockers[other] >> ind & 1:
+                blockers = blockers + [task]
+            if self.alternatives[other] >> ind & 1:
+                alternatives = alternatives + [task]
+
+            self.outer[other] = (blockers, alternatives)
+
+        self.outer = {
+            i - (i > ind): units for i, units in self.outer.items() if i != ind
+        }
+
+        masks = (self.blockers, self.alternatives, self.related)
+        for values in masks:
+            del values[ind]
+
+        low = (1 << ind) - 1
+        linked = set()
+        for i in self._linked:
+            if i == ind:
+                continue
+
+            i -= i > ind
+            for values in masks:
+                m = values[i]
+                values[i] = m and m & low | m >> ind + 1 << ind
+
+            if any(values[i] for values in masks):
+                linked.add(i)
+
+        self._linked = linked
+
+        for values in (
+            self.cost,
+            self.spent,
+            self.value,
+            self.tasks,
+            self.ids,
+        ):
+            del values[ind]
+
+        self.__dict__.pop("index", None)
+
+    def insert(self, ind, task):
+        """Insert a task into the pool.
+
+        Relations of the other tasks with the inserted one
+        move into the pool. Only the masks of the related
+        tasks are shifted, and the index is built anew on
+        the next access.
+
+        Args:
+            ind (int): Index to insert the task at.
+            task (work.task.Task): Task to insert.
+        """
+        self._unshare()
+        self.outer = {i + (i >= ind): units for i, units in self.outer.items()}
+
+        masks = (self.blockers, self.alternatives, self.related)
+        low = (1 << ind) - 1
+        for i in self._linked:
+            for values in masks:
+                m = values[i]
+                values[i] = m and m & low | m >> ind << ind + 1
+
+        self._linked = {i + (i >= ind) for i in self._linked}
+
+        for values in masks:
+            values.insert(ind, 0)
+
+        self.cost.insert(ind, task.cost)
+        self.spent.insert(ind, task.spent)
+        self.value.insert(ind, task.priority.value)
+        self.tasks.insert(ind, task)
+        self.ids.insert(ind, task.id)
+        self.__dict__.pop("index", None)
+
+        if task._relations:
+            # the related tasks are indexed anew
+            # to point to the task inside the pool
+            self._index_task(ind)
+            related = self.related[ind]
+            while related:
+                other = (related & -related).bit_length() - 1
+                related &= related - 1
+
+                self._index_task(other)
+
+    def reindex(self, inds):
+        """Index the relations and the priorities of the given tasks anew.
+
+        The copies and overlays made before aren't changed.
+
+        Args:
+            inds (Iterable[int]): Indices of the tasks.
+        """
+        self._unshare()
+        for ind in inds:
+            self.value[ind] = self.tasks[ind].priority.value
+            self._index_task(ind)
+
+    def todo(self, ind):
+        """Amount of energy left to be spent on the task.
+
+        Args:
+            ind (int): Index of the task.
+
+        Returns:
+            int: Energy left to be spent on the task.
+        """
+        return self.cost[ind] - self.spent[ind]
+
+    def is_solved(self, ind):
+        """Check if the task is solved.
+
+        Args:
+            ind (int): Index of the task.
+
+        Returns:
+            bool: True if the task is solved, False otherwise.
+        """
+        return self.spent[ind] == self.cost[ind]
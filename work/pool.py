@@ -1,8 +1,91 @@
-from .work_unit import Priority, WorkUnit
-from .task import Task
+import bisect
+import copy
+import weakref
+
+from .dry_pool import DryPool
+from .work_unit import Priority, Relations, WorkUnit
+from .task import Task, WorkLog
+
+
+class _Snapshots(weakref.WeakValueDictionary):
+    """Snapshots made of a pool, kept while they're in use.
+
+    Snapshots have the ids of the original pool, so they're
+    registered by their object identities. The registry is
+    shared by the original pool and the pools of its
+    snapshots, and isn't carried over to pickled copies.
+    """
+
+    def add(self, snapshot):
+        """Register a snapshot.
+
+        Args:
+            snapshot (Pool): Snapshot to register.
+        """
+        self[id(snapshot)] = snapshot
+
+    def __reduce__(self):
+        """Reduce the registry for pickling and copying.
+
+        Returns:
+            tuple: The class and no arguments (an empty registry).
+        """
+        return _Snapshots, ()
+
+
+class _Watchers(weakref.WeakValueDictionary):
+    """Pools indexing a unit out of its parent chain.
+
+    The pools are held weakly, so that views built over
+    the units of other pools are released with their last
+    reference. Pools are registered by their object
+    identities, as snapshots have the ids of the originals.
+
+    Args:
+        pools (Iterable[Pool]): Pools to register.
+    """
+
+    def __init__(self, pools=()):
+        super().__init__()
+        for pool in pools:
+            self.add(pool)
+
+    def add(self, pool):
+        """Register a pool.
+
+        Args:
+            pool (Pool): Pool to register.
+        """
+        self[id(pool)] = pool
+
+    def __reduce__(self):
+        """Reduce the registry for pickling.
+
+        Returns:
+            tuple: The class and the registered pools.
+        """
+        return _Watchers, (list(self.values()),)
+
+    def __deepcopy__(self, memo):
+        return _Watchers(copy.deepcopy(list(self.values()), memo))
 
 
 class Pool(WorkUnit):
+    __slots__ = (
+        "children",
+        "_direct",
+        "_owned",
+        "_unsolved",
+        "_todo",
+        "_seq",
+        "_next_seq",
+        "_queued",
+        "_keys",
+        "_dry",
+        "_snapshots",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         custom_fields=None,
@@ -13,27 +96,185 @@ class Pool(WorkUnit):
         name=None,
     ):
         self.children = {}
+        # direct children of the pool, by ids
+        self._direct = {}
         self._indexate_pool(children)
 
+        # children of other pools notify this one about their progress
+        for c in children:
+            if c.parent is not self:
+                if c._watchers is None:
+                    c._watchers = _Watchers()
+                c._watchers.add(self)
+
+        # ids of the tasks cloned by a snapshot
+        self._owned = None
+        # snapshots sharing tasks with the pool
+        self._snapshots = None
+        # number of unsolved tasks and energy left to solve them
+        self._unsolved, self._todo = self._tally(self.children.values())
+
+        # unsolved tasks sorted by cost (in the order of indexing
+        # for equal costs), their sort keys and the dry view;
+        # built on the first access to the dry view
+        self._seq = None
+        self._next_seq = 0
+        self._queued = None
+        self._keys = None
+        self._dry = None
+
         super().__init__(custom_fields, parent, priority, id_, name)
 
+    @staticmethod
+    def _tally(units):
+        """Count progress of the tasks among the given units.
+
+        Args:
+            units (Iterable[work.work_unit.WorkUnit]): Units to count.
+
+        Returns:
+            Tuple[int, int]:
+                Number of unsolved tasks and energy left to solve them.
+        """
+        unsolved = todo = 0
+        for unit in units:
+            if isinstance(unit, Task):
+                unsolved += not unit.is_solved
+                todo += unit.todo
+
+        return unsolved, todo
+
+    def _progress(self, task, unsolved, todo, cost):
+        """Account a change of progress of a task of the pool.
+
+        Args:
+            task (work.task.Task): Task that progressed.
+            unsolved (int): Change of the number of unsolved tasks.
+            todo (int): Change of the energy left to be spent.
+            cost (int): Cost of the task before the change.
+        """
+        if self.children.get(task.id) is task:
+            self._count(unsolved, todo)
+
+            # the queue is maintained, once it's built
+            queued = (not task.is_solved) - unsolved
+            if self._seq is not None:
+                if queued and not task.is_solved and cost == task.cost:
+                    # the task keeps its place, only the spent amount changes
+                    dry = self._dry
+                    if dry is not None:
+                        ind = bisect.bisect_left(
+                            self._keys, (cost, self._seq[task.id])
+                        )
+                        dry.spent[ind] = task.spent
+                else:
+                    if queued:
+                        self._unqueue(task, cost)
+                    if not task.is_solved:
+                        self._queue(task)
+
+        super()._progress(task, unsolved, todo, cost)
+
+    def _count(self, unsolved, todo):
+        """Change the progress counters of the pool.
+
+        Args:
+            unsolved (int): Change of the number of unsolved tasks.
+            todo (int): Change of the energy left to be spent.
+        """
+        solved = not self._unsolved
+        self._unsolved += unsolved
+        self._todo += todo
+
+        if solved != (not self._unsolved):
+            self._solved_changed()
+
+    def _queue(self, task):
+        """Insert an unsolved task into the cost-sorted queue.
+
+        Args:
+            task (work.task.Task): Task to insert.
+        """
+        key = (task.cost, self._seq[task.id])
+        ind = bisect.bisect(self._keys, key)
+
+        self._keys.insert(ind, key)
+        self._queued.insert(ind, task)
+
+        dry = self._dry
+        if dry is not None:
+            dry.insert(ind, task)
+
+    def _unqueue(self, task, cost):
+        """Remove a task from the cost-sorted queue.
+
+        Args:
+            task (work.task.Task): Task to remove.
+            cost (int): Cost the task was queued with.
+        """
+        ind = bisect.bisect_left(self._keys, (cost, self._seq[task.id]))
+
+        del self._keys[ind]
+        del self._queued[ind]
+
+        dry = self._dry
+        if dry is not None:
+            dry.remove(ind)
+
+    def _build_queue(self):
+        """Build the cost-sorted queue of the unsolved tasks."""
+        self._seq = {id_: seq for seq, id_ in enumerate(self.children)}
+        self._next_seq = len(self._seq)
+        self._queued = [
+            c
+            for c in self.children.values()
+            if isinstance(c, Task) and not c.is_solved
+        ]
+        self._queued.sort(key=lambda t: t.cost)
+        self._keys = [(t.cost, self._seq[t.id]) for t in self._queued]
+
+    def _reindex(self, unit):
+        """Index the relations and the priority of a task anew.
+
+        Args:
+            unit (work.work_unit.WorkUnit):
+                Unit, relations or priority of which changed.
+        """
+        dry = self._dry
+        if (
+            dry is None
+            or not isinstance(unit, Task)
+            or unit.is_solved
+            or self.children.get(unit.id) is not unit
+        ):
+            return
+
+        ind = bisect.bisect_left(self._keys, (unit.cost, self._seq[unit.id]))
+        dry.reindex([ind])
+
     def _indexate_pool(self, pool):
         for c in pool:
-            if c.id in self.children:
-                raise ValueError(
-                    f"Child '{c.name}' with id '{c.id}' already exists in the pool {self.name}."
-                )
-
+            units = [c]
             if isinstance(c, Pool):
-                self._indexate_pool(c)
+                # including the children of other pools it indexes
+                units.extend(c.children.values())
+
+            for unit in units:
+                if unit.id in self.children:
+                    raise ValueError(
+                        f"Child '{unit.name}' with id '{unit.id}' already exists in the pool {self.name}."
+                    )
+
+                self.children[unit.id] = unit
 
             if not c.parent:
                 c.parent = self
 
-            self.children[c.id] = c
+            if c.parent is self:
+                self._direct[c.id] = c
 
     def __iter__(self):
-        return iter(filter(lambda c: c.parent == self, self.children.values()))
+        return iter(self._direct.values())
 
     def __len__(self):
         return len(self.children)
@@ -43,61 +284,359 @@ class Pool(WorkUnit):
 
     @property
     def dry(self):
-        todo = list(
-            filter(
-                lambda c: not c.is_solved and isinstance(c, Task),
-                self.children.values(),
-            )
-        )
-        todo.sort(key=lambda t: t.cost)
+        """Short form of the unsolved tasks of the pool, sorted by cost.
+
+        The dry view is cached and kept up to date: spent amounts
+        are updated in place, and tasks added, popped, solved,
+        reopened or changing their costs are spliced in and out
+        at their places in the cost-sorted queue of the tasks.
+        Tasks, relations or priorities of which change, are
+        indexed anew. The queue is built on the first access.
+
+        Returns:
+            work.dry_pool.DryPool: Short form of the pool.
+        """
+        if self._seq is None:
+            self._build_queue()
 
-        dry = {t.id: t.dry for t in todo}
-        return dry
+        if self._dry is None:
+            self._dry = DryPool(self._queued)
+
+        return self._dry.copy()
 
     @property
     def done(self):
-        for t in filter(
-            lambda c: c.is_solved and c.parent == self, self.children.values()
-        ):
+        for t in filter(lambda c: c.is_solved, self._direct.values()):
             yield t
 
     @property
     def is_solved(self):
-        for c in self.children.values():
-            if not c.is_solved:
-                return False
+        return not self._unsolved
 
-        return True
+    @property
+    def todo_cost(self):
+        """Amount of energy left to be spent on the tasks of the pool.
+
+        Returns:
+            int: Energy left to be spent on the tasks.
+        """
+        return self._todo
 
     @property
     def todo(self):
-        for t in filter(
-            lambda c: not c.is_solved and c.parent == self,
-            self.children.values(),
-        ):
+        for t in filter(lambda c: not c.is_solved, self._direct.values()):
             yield t
 
     def add(self, child):
-        if child.id in self.children:
-            raise ValueError(
-                f"Child with id '{child.id}' already exists in the pool {self.id}."
-            )
+        units = {child.id: child}
+        if isinstance(child, Pool):
+            units.update(child.children)
+
+        # the pools above index the descendants as well
+        pools = self._upwards([self])
+        for pool in pools:
+            for id_ in units:
+                if id_ in pool.children:
+                    raise ValueError(
+                        f"Child with id '{id_}' already exists in the pool {pool.id}."
+                    )
 
         child.parent = self
-        self.children[child.id] = child
+        self._direct[child.id] = child
 
-        if isinstance(child, Pool):
-            self._indexate_pool(child)
+        unsolved, todo = self._tally(units.values())
+        for pool in pools:
+            pool.children.update(units)
+            pool._count(unsolved, todo)
+            if pool._seq is None:
+                continue
+
+            for unit in units.values():
+                pool._seq[unit.id] = pool._next_seq
+                pool._next_seq += 1
+                if isinstance(unit, Task) and not unit.is_solved:
+                    pool._queue(unit)
+
+    @staticmethod
+    def _upwards(pools):
+        """Find the pools passing progress up from the given ones.
+
+        Progress goes to the parent pools, and to the pools
+        indexing the units out of their parent chains.
+
+        Args:
+            pools (Iterable[Optional[work.work_unit.WorkUnit]]):
+                Units to start from.
+
+        Returns:
+            List[Pool]: The given pools and the ones above, once each.
+        """
+        found = []
+        stack = list(pools)
+        while stack:
+            pool = stack.pop()
+            if isinstance(pool, Pool) and not any(pool is p for p in found):
+                found.append(pool)
+                stack.append(pool.parent)
+                if pool._watchers:
+                    stack.extend(pool._watchers.values())
+
+        return found
 
     def get(self, child_id):
         return self.children[child_id]
 
     def pop(self, child_id):
         child = self.children[child_id]
-        if child.parent != self:
-            child.parent.pop(child_id)
 
-        self.children[child_id].parent = None
-        del self.children[child_id]
+        units = [child]
+        if isinstance(child, Pool):
+            units.extend(child.children.values())
+
+        # snapshots sharing the tasks are found through
+        # the pools the tasks leave, so they clone them now
+        for unit in units:
+            if isinstance(unit, Task):
+                unit._freeze()
+
+        # the pools from the parent of the child up to the root
+        pools = self._upwards(
+            [
+                self._unit(child.parent) if child.parent else None,
+                *(self._unit(w) for w in (child._watchers or {}).values()),
+            ]
+        )
+        if not any(pool is self for pool in pools):
+            # the child of another pool, indexed by this one
+            pools.extend(
+                pool
+                for pool in self._upwards([self])
+                if not any(pool is p for p in pools)
+            )
+
+        for pool in pools:
+            if pool._direct.get(child_id) is child:
+                del pool._direct[child_id]
 
+        if child._watchers:
+            child._watchers = (
+                _Watchers(
+                    w
+                    for w in child._watchers.values()
+                    if not any(w is p for p in pools)
+                )
+                or None
+            )
+
+        for pool in pools:
+            removed = [
+                pool.children.pop(unit.id)
+                for unit in units
+                if pool.children.get(unit.id) is unit
+            ]
+            if pool._seq is not None:
+                for unit in removed:
+                    if isinstance(unit, Task) and not unit.is_solved:
+                        pool._unqueue(unit, unit.cost)
+
+                    del pool._seq[unit.id]
+
+            unsolved, todo = self._tally(removed)
+            pool._count(-unsolved, -todo)
+
+        child.parent = None
         return child
+
+    def record(self, work_done):
+        """Record a piece of work done on a task of the pool.
+
+        If the pool is a snapshot, and the task is still
+        shared with the original pool, the task is cloned
+        first, so that the original pool isn't changed.
+
+        Args:
+            work_done (work.work_unit.WorkDone): Work to record.
+        """
+        task = self.children[work_done.task.id]
+        if self._owned is not None and task.id not in self._owned:
+            task = self._own(task)
+
+        task.work_done.append(work_done)
+
+    def snapshot(self):
+        """Make a copy-on-write snapshot of the pool.
+
+        Pools of the hierarchy are copied, while tasks
+        are shared with the original pool until work is
+        recorded on them through the snapshot. A shared
+        task, which is about to change in the original
+        pool, is cloned by the snapshot in advance.
+
+        Returns:
+            Pool: The snapshot.
+        """
+        if self._snapshots is None:
+            self._snapshots = _Snapshots()
+
+        owned = set()
+        clones = {self.id: copy.copy(self)}
+        for c in self.children.values():
+            if isinstance(c, Pool):
+                clones[c.id] = copy.copy(c)
+
+        for clone in clones.values():
+            clone.children = {
+                id_: clones.get(id_, c) for id_, c in clone.children.items()
+            }
+            clone._direct = {id_: clone.children[id_] for id_ in clone._direct}
+            if clone._seq is not None:
+                clone._seq = dict(clone._seq)
+                clone._keys = list(clone._keys)
+                clone._queued = list(clone._queued)
+            if clone._dry is not None:
+                clone._dry = clone._dry.copy()
+            if clone.parent is not None and clone.id != self.id:
+                clone._parent = clones.get(clone.parent.id, clone.parent)
+            if clone._relations:
+                clone._relations = Relations(clone, clone._relations)
+            if clone._watchers:
+                clone._watchers = _Watchers(
+                    clones.get(w.id, w) for w in clone._watchers.values()
+                )
+
+            clone._owned = owned
+            clone._snapshots = self._snapshots
+
+        self._snapshots.add(clones[self.id])
+        return clones[self.id]
+
+    def _requeue(self, task, clone):
+        """Replace a task by its clone in the cost-sorted queue.
+
+        Args:
+            task (work.task.Task): Task to replace.
+            clone (work.task.Task): Clone of the task.
+        """
+        if self._seq is None or task.is_solved:
+            return
+
+        ind = bisect.bisect_left(self._keys, (task.cost, self._seq[task.id]))
+        self._queued[ind] = clone
+
+        dry = self._dry
+        if dry is not None:
+            dry.tasks = dry.tasks[:ind] + [clone] + dry.tasks[ind + 1 :]
+
+    def _unit(self, unit):
+        """Find the given unit's counterpart in the pool.
+
+        Args:
+            unit (work.work_unit.WorkUnit): Unit to find.
+
+        Returns:
+            work.work_unit.WorkUnit:
+                Unit of this pool with the same id, or the given
+                unit, if it's not a part of the pool.
+        """
+        if unit.id == self.id:
+            return self
+
+        return self.children.get(unit.id, unit)
+
+    def _own(self, task):
+        """Clone a task shared with the original pool.
+
+        Units related to the task are cloned as well (and the
+        ones related to them), so that relations of the
+        snapshot connect the units of the snapshot.
+
+        Args:
+            task (work.task.Task): Task to clone.
+
+        Returns:
+            work.task.Task: The clone.
+        """
+        units = {}
+        relations = {}
+        # snapshot pools the clones were put into
+        pools = []
+
+        queue = [task]
+        while queue:
+            unit = queue.pop()
+            if unit.id in units:
+                continue
+
+            if isinstance(unit, Task) and unit.id not in self._owned:
+                clone = copy.copy(unit)
+                clone._work_done = WorkLog(clone, unit.work_done)
+                if unit.parent is not None:
+                    clone._parent = self._unit(unit.parent)
+                if unit._watchers:
+                    clone._watchers = _Watchers(
+                        self._unit(w) for w in unit._watchers.values()
+                    )
+
+                self._owned.add(clone.id)
+                self.children[clone.id] = clone
+
+                # replace the task in the snapshot pools above
+                pool = clone.parent
+                if (
+                    isinstance(pool, Pool)
+                    and pool._owned is self._owned
+                    and clone.id in pool._direct
+                ):
+                    pool._direct[clone.id] = clone
+
+                for pool in self._upwards(
+                    [clone.parent, *(clone._watchers or {}).values()]
+                ):
+                    if (
+                        pool._owned is self._owned
+                        and clone.id in pool.children
+                    ):
+                        pool.children[clone.id] = clone
+                        pool._requeue(unit, clone)
+                        if not any(pool is p for p in pools):
+                            pools.append(pool)
+
+                unit = clone
+
+            units[unit.id] = unit
+            for rel in unit._related:
+                relations[rel.id] = rel
+
+                for related in rel.units:
+                    if related.id not in units and (
+                        related.id in self.children or related.id == self.id
+                    ):
+                        queue.append(self._unit(related))
+
+        # relations of the snapshot must connect the units
+        # of the snapshot, not the ones of the original pool
+        remapped = {
+            id_: dict(unit._relations or {}) for id_, unit in units.items()
+        }
+        for rel in relations.values():
+            clone = copy.copy(rel)
+            clone._remap(units)
+
+            for unit in clone.units:
+                if unit.id in units:
+                    remapped[unit.id][clone.id] = clone
+
+        for id_, unit in units.items():
+            unit._relations = Relations(unit, remapped[id_]) or None
+            unit._block_changed()
+
+        # the relations are the same, so the dry views are kept,
+        # only the units out of them are the clones now
+        for pool in pools:
+            dry = pool._dry
+            if dry is not None:
+                inds = [dry.index[id_] for id_ in units if id_ in dry.index]
+                if inds:
+                    dry.reindex(inds)
+
+        return units[task.id]
@@ -2,6 +2,8 @@ from base import Id
 
 
 class Alternative(Id):
+    __slots__ = ("alternatives",)
+
     def __init__(self, *alternatives, id_=None):
         super().__init__(id_)
 
@@ -19,8 +21,19 @@ class Alternative(Id):
     def is_solved(self):
         return any(unit.is_solved for unit in self.alternatives)
 
+    @property
+    def units(self):
+        return self.alternatives
+
+    def _remap(self, units):
+        self.alternatives = tuple(
+            units.get(unit.id, unit) for unit in self.alternatives
+        )
+
 
 class Blocking(Id):
+    __slots__ = ("blocker", "blocked")
+
     def __init__(self, blocker, blocked, id_=None):
         super().__init__(id_)
 
@@ -30,6 +43,14 @@ class Blocking(Id):
         blocked.relations[self.id] = self
         blocker.relations[self.id] = self
 
+    @property
+    def units(self):
+        return self.blocker, self.blocked
+
+    def _remap(self, units):
+        self.blocker = units.get(self.blocker.id, self.blocker)
+        self.blocked = units.get(self.blocked.id, self.blocked)
+
     def drop(self):
         del self.blocked.relations[self.id]
         del self.blocker.relations[self.id]
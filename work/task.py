@@ -3,6 +3,77 @@
 from .work_unit import Priority, WorkUnit
 
 
+class WorkLog(list):
+    """Pieces of work done on a task.
+
+    Notifies the task on every change of the log, so
+    that the task keeps its spent amount up to date.
+
+    Args:
+        task (Task): Task the work is done on.
+        work_done (Iterable[work.work_unit.WorkDone]):
+            Pieces of work done.
+    """
+
+    __slots__ = ("task",)
+
+    def __init__(self, task, work_done=()):
+        self.task = task
+        super().__init__(work_done)
+
+    def __reduce__(self):
+        """Reduce the log for pickling and copying.
+
+        Returns:
+            tuple: The class and the arguments to rebuild the log.
+        """
+        return WorkLog, (self.task, list(self))
+
+    def _changing(method):
+        """Wrap a list method to notify the task on changes.
+
+        Args:
+            method (Callable): List method to wrap.
+
+        Returns:
+            Callable: Wrapped method.
+        """
+
+        def wrapper(self, *args):
+            self.task._freeze()
+            result = method(self, *args)
+            self.task._recount()
+            return result
+
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    def append(self, work_done):
+        """Append a piece of work done to the log.
+
+        Args:
+            work_done (work.work_unit.WorkDone): Work done.
+        """
+        self.task._freeze()
+        super().append(work_done)
+        self.task._progressed(
+            self.task.cost, self.task.spent + work_done.amount
+        )
+
+    clear = _changing(list.clear)
+    extend = _changing(list.extend)
+    insert = _changing(list.insert)
+    pop = _changing(list.pop)
+    remove = _changing(list.remove)
+    __delitem__ = _changing(list.__delitem__)
+    __iadd__ = _changing(list.__iadd__)
+    __imul__ = _changing(list.__imul__)
+    __setitem__ = _changing(list.__setitem__)
+
+    del _changing
+
+
 class Task(WorkUnit):
     """A piece of work to do.
 
@@ -17,12 +88,14 @@ class Task(WorkUnit):
             Parent pool.
         priority (Optional[Priority]):
             Priority of the task. Defaults to "medium" priority.
-        id_ (Optional[str | uuid.UUID]):
+        id_ (Optional[str | int | uuid.UUID]):
             Id of the task. Generated, if not provided explicitly.
         name (Optional[str]):
             Name of the task.
     """
 
+    __slots__ = ("_cost", "_spent", "_work_done")
+
     def __init__(
         self,
         cost,
@@ -32,8 +105,9 @@ class Task(WorkUnit):
         id_=None,
         name=None,
     ):
-        self.work_done = []
-        self.cost = cost
+        self._cost = cost
+        self._spent = 0
+        self._work_done = WorkLog(self)
 
         super().__init__(custom_fields, parent, priority, id_, name)
 
@@ -59,6 +133,35 @@ class Task(WorkUnit):
             "priority": self.priority,
         }
 
+    @property
+    def work_done(self):
+        """Pieces of work done on the task.
+
+        Returns:
+            WorkLog: Pieces of work done.
+        """
+        return self._work_done
+
+    @work_done.setter
+    def work_done(self, work_done):
+        self._freeze()
+        self._work_done = WorkLog(self, work_done)
+        self._recount()
+
+    @property
+    def cost(self):
+        """Energy cost of the task.
+
+        Returns:
+            int: Energy cost of the task.
+        """
+        return self._cost
+
+    @cost.setter
+    def cost(self, cost):
+        self._freeze()
+        self._progressed(cost, self._spent)
+
     @property
     def spent(self):
         """Amount of energy spent on the task.
@@ -66,7 +169,7 @@ class Task(WorkUnit):
         Returns:
             int: Energy spent on the task.
         """
-        return sum(w.amount for w in self.work_done)
+        return self._spent
 
     @property
     def is_solved(self):
@@ -75,7 +178,7 @@ class Task(WorkUnit):
         Returns:
             bool: True if the task is solved, False otherwise.
         """
-        return self.spent == self.cost
+        return self._spent == self._cost
 
     @property
     def todo(self):
@@ -84,4 +187,30 @@ class Task(WorkUnit):
         Returns:
             int: Energy left to be spent on the task.
         """
-        return self.cost - self.spent
+        return self._cost - self._spent
+
+    def _recount(self):
+        """Recount the energy spent on the task from its work log."""
+        self._progressed(self._cost, sum(w.amount for w in self._work_done))
+
+    def _progressed(self, cost, spent):
+        """Update the cost and the spent amount of the task.
+
+        The pools containing the task are notified about
+        the change of their progress.
+
+        Args:
+            cost (int): New cost of the task.
+            spent (int): New amount of energy spent on the task.
+        """
+        unsolved = (spent != cost) - (self._spent != self._cost)
+        todo = cost - spent - self._cost + self._spent
+        previous = self._cost
+
+        self._cost = cost
+        self._spent = spent
+        if unsolved:
+            self._solved_changed()
+
+        if todo or cost != previous:
+            self._progress(self, unsolved, todo, previous)
@@ -13,6 +13,17 @@ from .relation import Alternative, Blocking
 
 
 class Priority:
+    """Priority of a work unit.
+
+    There is a single instance of every priority, so
+    that the units of the same priority share it.
+
+    Args:
+        label (str): Priority label.
+    """
+
+    __slots__ = ("label", "value")
+
     exp_values = {
         "lowest": 1,
         "low": 2,
@@ -20,18 +31,108 @@ class Priority:
         "high": 8,
         "highest": 16,
     }
+    _interned = {}
+
+    def __new__(cls, label):
+        priority = cls._interned.get(label)
+        if priority is None:
+            priority = super().__new__(cls)
+            priority.label = label
+            priority.value = cls.exp_values[label]
+
+            cls._interned[label] = priority
 
-    def __init__(self, label):
-        self.label = label
-        self.value = self.exp_values[label]
+        return priority
+
+    def __reduce__(self):
+        """Reduce the priority to its label for pickling and copying.
+
+        Returns:
+            tuple: The class and the label.
+        """
+        return Priority, (self.label,)
 
     def __repr__(self):
         return f"Priority('{self.label}')"
 
 
+class Relations(dict):
+    """Relations of a work unit, by relation ids.
+
+    Every change of the relations invalidates the cached
+    block state of the unit and the dry views of the pools.
+
+    Args:
+        unit (WorkUnit): Unit the relations belong to.
+        relations (Dict[Any, Union[Alternative, Blocking]]):
+            Relations, by relation ids.
+    """
+
+    __slots__ = ("unit",)
+
+    def __init__(self, unit, relations=()):
+        self.unit = unit
+        super().__init__(relations)
+
+    def __reduce__(self):
+        """Reduce the relations for pickling and copying.
+
+        Returns:
+            tuple: The class and the arguments to rebuild the relations.
+        """
+        return Relations, (self.unit, dict(self))
+
+    def _changed(self):
+        """Update the caches depending on the relations."""
+        self.unit._block_changed()
+        self.unit._restructured()
+
+    def _changing(method):
+        """Wrap a dict method to invalidate the caches on changes.
+
+        Args:
+            method (Callable): Dict method to wrap.
+
+        Returns:
+            Callable: Wrapped method.
+        """
+
+        def wrapper(self, *args):
+            self.unit._freeze()
+            result = method(self, *args)
+            self._changed()
+            return result
+
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    clear = _changing(dict.clear)
+    pop = _changing(dict.pop)
+    popitem = _changing(dict.popitem)
+    setdefault = _changing(dict.setdefault)
+    update = _changing(dict.update)
+    __delitem__ = _changing(dict.__delitem__)
+    __ior__ = _changing(dict.__ior__)
+    __setitem__ = _changing(dict.__setitem__)
+
+    del _changing
+
+
 class WorkUnit(Id, metaclass=abc.ABCMeta):
     """Represents a single work unit to do. Can be a task or a pool.
 
+    Every unit caches whether its own relations block it, and
+    whether it or one of its ancestors is blocked. The caches
+    are dropped, when the relations of the unit change, or when
+    one of its blockers gets solved or reopened. The latter
+    cache is dropped down the subtree of the unit then, and
+    on parent changes as well. Blockers find the units they
+    block through their own relations, so a blocking must be
+    dropped from both of its units (see Blocking.drop()).
+    Changes of relations and priorities also make the pools
+    indexing the unit index it anew in their cached dry views.
+
     Args:
         custom_fields (Optional[Dict[str: Any]]):
             Custom fields for the work unit. Can be accessed by keys:
@@ -40,12 +141,23 @@ class WorkUnit(Id, metaclass=abc.ABCMeta):
             Parent pool.
         priority (Optional[Priority]):
             Priority of the work unit. Defaults to "medium" priority.
-        id_ (Optional[str | uuid.UUID]):
+        id_ (Optional[str | int | uuid.UUID]):
             Id of the work unit. Generated, if not provided explicitly.
         name (Optional[str]):
             Name of the work unit.
     """
 
+    __slots__ = (
+        "_custom_fields",
+        "name",
+        "_relations",
+        "_priority",
+        "_parent",
+        "_blocked",
+        "_chain_blocked",
+        "_watchers",
+    )
+
     def __init__(
         self,
         custom_fields=None,
@@ -56,11 +168,198 @@ class WorkUnit(Id, metaclass=abc.ABCMeta):
     ):
         super().__init__(id_)
 
-        self.custom_fields = custom_fields or {}
+        # custom fields and relations are allocated on demand
+        self._custom_fields = custom_fields or None
         self.name = name
-        self.relations = {}
-        self.priority = priority
-        self.parent = parent
+        self._relations = None
+        self._blocked = None
+        self._chain_blocked = None
+        # pools indexing the unit, which aren't its ancestors
+        self._watchers = None
+        self._priority = priority
+        self._parent = parent
+
+    def _above(self):
+        """Find the units above this one.
+
+        Returns:
+            List[WorkUnit]:
+                Parents of the unit, up to the root, and the
+                pools indexing it out of its parent chain
+                (and the ones above them), once each.
+        """
+        found = []
+        stack = [self._parent, *(self._watchers or {}).values()]
+        while stack:
+            unit = stack.pop()
+            if unit is not None and not any(unit is u for u in found):
+                found.append(unit)
+                stack.append(unit._parent)
+                if unit._watchers:
+                    stack.extend(unit._watchers.values())
+
+        return found
+
+    def _freeze(self):
+        """
+        Let the snapshots sharing the unit with the pools
+        above clone it, before the unit changes.
+        """
+        for pool in self._above():
+            snapshots = getattr(pool, "_snapshots", None)
+            for snapshot in snapshots.values() if snapshots else ():
+                if (
+                    snapshot.children.get(self.id) is self
+                    and self.id not in snapshot._owned
+                ):
+                    snapshot._own(self)
+
+    def _restructured(self):
+        """
+        Update the dry views of the pools indexing the
+        unit, after its relations or priority change.
+        """
+        for unit in self._above():
+            unit._reindex(self)
+
+    def _reindex(self, unit):
+        """Update the dry view of the unit with a changed unit below.
+
+        Only pools have dry views, so it does nothing by default.
+
+        Args:
+            unit (WorkUnit): Unit, relations or priority of which changed.
+        """
+
+    def _solved_changed(self):
+        """
+        Invalidate the block states of the units blocked
+        by this one, when it gets solved or reopened.
+        """
+        for rel in self._related:
+            if isinstance(rel, Blocking) and rel.blocker == self:
+                rel.blocked._block_changed()
+
+    def _block_changed(self):
+        """
+        Drop the cached block state of the unit, and the cached
+        states of the unit and the units below it, which depend
+        on whether the unit is blocked.
+        """
+        self._blocked = None
+        self._chain_changed()
+
+    def _chain_changed(self):
+        """
+        Drop the cached states of the unit and the units below
+        it, telling whether they or their ancestors are blocked.
+
+        A unit caches its state only with the states of its
+        ancestors it depends on, so the units, which have no
+        state cached, have no dependent states cached below.
+        """
+        stack = [self]
+        while stack:
+            unit = stack.pop()
+            if unit._chain_blocked is None:
+                continue
+
+            unit._chain_blocked = None
+            children = getattr(unit, "_direct", None)
+            if children:
+                stack.extend(c for c in children.values() if c._parent is unit)
+
+    @property
+    def parent(self):
+        """Parent pool of the unit.
+
+        Returns:
+            Optional[work.pool.Pool]: Parent pool.
+        """
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent):
+        self._freeze()
+        self._parent = parent
+        self._chain_changed()
+
+    @property
+    def custom_fields(self):
+        """Custom fields of the unit.
+
+        Returns:
+            Dict[str, Any]: Custom fields.
+        """
+        if self._custom_fields is None:
+            self._custom_fields = {}
+
+        return self._custom_fields
+
+    @custom_fields.setter
+    def custom_fields(self, custom_fields):
+        self._custom_fields = custom_fields
+
+    @property
+    def relations(self):
+        """Relations of the unit, by relation ids.
+
+        Returns:
+            Dict[Any, Union[Alternative, Blocking]]: Relations.
+        """
+        if self._relations is None:
+            self._relations = Relations(self)
+
+        return self._relations
+
+    @property
+    def _related(self):
+        """Relations of the unit, without allocating them.
+
+        Returns:
+            Iterable[Union[Alternative, Blocking]]: Relations.
+        """
+        return self._relations.values() if self._relations else ()
+
+    @relations.setter
+    def relations(self, relations):
+        self._freeze()
+        self._relations = Relations(self, relations)
+        self._relations._changed()
+
+    @property
+    def priority(self):
+        """Priority of the unit.
+
+        Returns:
+            Priority: Priority of the unit.
+        """
+        return self._priority
+
+    @priority.setter
+    def priority(self, priority):
+        self._freeze()
+        self._priority = priority
+        self._restructured()
+
+    def _progress(self, task, unsolved, todo, cost):
+        """Account a change of progress of a task below the unit.
+
+        The change is passed to the parent pool, and to the
+        pools indexing the unit out of its parent chain.
+
+        Args:
+            task (work.task.Task): Task that progressed.
+            unsolved (int): Change of the number of unsolved tasks.
+            todo (int): Change of the energy left to be spent.
+            cost (int): Cost of the task before the change.
+        """
+        if self.parent is not None:
+            self.parent._progress(task, unsolved, todo, cost)
+
+        if self._watchers:
+            for pool in self._watchers.values():
+                pool._progress(task, unsolved, todo, cost)
 
     @abc.abstractmethod
     def is_solved(self):
@@ -111,7 +410,7 @@ class WorkUnit(Id, metaclass=abc.ABCMeta):
         Yields:
             work.relation.Blocking: Blocking relations.
         """
-        for rel in self.relations.values():
+        for rel in self._related:
             if (
                 isinstance(rel, Blocking)
                 and rel.blocked == self
@@ -128,7 +427,7 @@ class WorkUnit(Id, metaclass=abc.ABCMeta):
         Yields:
             work.relation.Blocking: Blocking relations.
         """
-        for rel in self.relations.values():
+        for rel in self._related:
             if (
                 isinstance(rel, Blocking)
                 and rel.blocker == self
@@ -145,7 +444,7 @@ class WorkUnit(Id, metaclass=abc.ABCMeta):
                 True if the unit is not solved and its
                 alternatives are not solved as well.
         """
-        for rel in self.relations.values():
+        for rel in self._related:
             if isinstance(rel, Alternative) and rel.is_solved:
                 return False
 
@@ -155,14 +454,61 @@ class WorkUnit(Id, metaclass=abc.ABCMeta):
     def is_blocked(self):
         """Check if this unit is blocked by another unit.
 
+        A unit is also blocked, if one of its ancestors is.
+        The state is cached on the unit and on its ancestors
+        walked through to find it.
+
         Returns:
            bool: True if the unit is blocked, False otherwise.
         """
-        try:
-            next(self.blocked_by)
-            return True
-        except StopIteration:
-            return self.parent.is_blocked if self.parent else False
+        if self._chain_blocked is not None:
+            return self._chain_blocked
+
+        chain = []
+        blocked = False
+        unit = self
+        while unit is not None:
+            if unit._chain_blocked is not None:
+                blocked = unit._chain_blocked
+                break
+
+            chain.append(unit)
+            own = unit._blocked
+            if own is None:
+                own = unit._blocked = any(True for _ in unit.blocked_by)
+
+            if own:
+                blocked = True
+                break
+
+            unit = unit.parent
+
+        # the states are cached only on the units, which get them
+        # dropped by their ancestors: the ones indexed by the pools
+        # they're parented to, from the top of the walk down
+        above = None if unit is chain[-1] else unit
+        for unit in reversed(chain):
+            if above is not None and _child(above, unit) is not unit:
+                break
+
+            unit._chain_blocked = blocked
+            above = unit
+
+        return blocked
+
+
+def _child(unit, child):
+    """Direct child of a pool, by the id of the given unit.
+
+    Args:
+        unit (WorkUnit): Possible parent pool.
+        child (WorkUnit): Unit to look for.
+
+    Returns:
+        Optional[WorkUnit]: The child, None if there is no such.
+    """
+    children = getattr(unit, "_direct", None)
+    return children.get(child.id) if children else None
 
 
 class WorkDone:
@@ -183,6 +529,8 @@ class WorkDone:
             Cycle number of the work cycle. Defaults to 1.
     """
 
+    __slots__ = ("task", "amount", "assignee", "cycle", "dry")
+
     def __init__(self, task, energy_spent, assignee, cycle=1):
         self.task = task
         self.amount = energy_spent